@@ -0,0 +1,308 @@
+# api/bot.py
+# Router de comandos del bot de Telegram: tabla de despacho por comando,
+# argumentos parseados según un esquema y handlers que llaman al TurnoService.
+import logging
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Protocol
+
+from domain.service import TurnoService, SlotOcupadoError
+from domain.tracing import span
+
+log = logging.getLogger(__name__)
+
+
+class Transporte(Protocol):
+    # TelegramClient cumple esto; en pruebas alcanza con un stub que guarde los mensajes
+    async def enviar(self, chat_id: int, text: str) -> bool: ...
+
+
+class ArgumentoInvalido(ValueError):
+    pass
+
+
+# ---------------------------
+# Parsers de argumentos
+# ---------------------------
+def arg_fecha(valor: str) -> str:
+    try:
+        return datetime.strptime(valor, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise ArgumentoInvalido("fecha_invalida")
+
+
+def arg_hora(valor: str) -> str:
+    try:
+        return datetime.strptime(valor, "%H:%M").strftime("%H:%M")
+    except ValueError:
+        raise ArgumentoInvalido("hora_invalida")
+
+
+def arg_ticket(valor: str) -> str:
+    try:
+        return TurnoService.encode_ticket(TurnoService.decode_ticket(valor))
+    except ValueError:
+        raise ArgumentoInvalido("ticket_invalido")
+
+
+def arg_entero(valor: str) -> int:
+    if not valor.isdigit():
+        raise ArgumentoInvalido("numero_invalido")
+    return int(valor)
+
+
+def arg_texto(valor: str) -> str:
+    return valor.strip()
+
+
+class Comando:
+    """
+    args: lista de (nombre, parser). Con resto=True el último argumento se
+    queda con todo el texto que sobra (p.ej. "Corte de pelo").
+    opcionales: cuántos de los últimos argumentos pueden faltar.
+    """
+
+    def __init__(
+        self,
+        nombre: str,
+        handler: Callable[..., Awaitable[str]],
+        args: list[tuple[str, Callable[[str], Any]]] | None = None,
+        uso: str = "",
+        descripcion: str = "",
+        resto: bool = False,
+        opcionales: int = 0,
+    ):
+        self.nombre = nombre
+        self.handler = handler
+        self.args = args or []
+        self.uso = uso or nombre
+        self.descripcion = descripcion
+        self.resto = resto
+        self.opcionales = opcionales
+
+    def parsear(self, texto_args: str) -> dict[str, Any]:
+        n = len(self.args)
+        if n == 0:
+            # Sin argumentos se ignora lo que venga (p.ej. "/start <payload>" de un deep link)
+            return {}
+        partes = texto_args.split(maxsplit=n - 1) if self.resto else texto_args.split()
+        if len(partes) < n - self.opcionales:
+            raise ArgumentoInvalido("faltan_argumentos")
+        if len(partes) > n:
+            raise ArgumentoInvalido("sobran_argumentos")
+        return {
+            nombre: parser(valor)
+            for (nombre, parser), valor in zip(self.args, partes)
+        }
+
+
+class RouterComandos:
+    def __init__(self, service: TurnoService, transporte: Transporte, espera=None):
+        # espera: ListaEspera opcional (habilita /esperar y /noesperar)
+        self.service = service
+        self.transporte = transporte
+        self.espera = espera
+        self._comandos: dict[str, Comando] = {}
+        self._metricas: dict[str, dict[str, float]] = {}
+        self._registrar_comandos()
+
+    # ---------- Registro ----------
+    def registrar(self, comando: Comando) -> None:
+        self._comandos[comando.nombre] = comando
+        self._metricas[comando.nombre] = {
+            "llamadas": 0, "errores": 0, "total_ms": 0.0, "max_ms": 0.0,
+        }
+
+    def _registrar_comandos(self) -> None:
+        self.registrar(Comando(
+            "/start", self.cmd_start, descripcion="ver los comandos",
+        ))
+        self.registrar(Comando(
+            "/disponibilidad", self.cmd_disponibilidad,
+            args=[("fecha", arg_fecha), ("servicio", arg_texto)],
+            resto=True,
+            opcionales=1,
+            uso="/disponibilidad 2025-11-20",
+            descripcion="horarios libres de un día",
+        ))
+        self.registrar(Comando(
+            "/reservar", self.cmd_reservar,
+            args=[("fecha", arg_fecha), ("hora", arg_hora), ("servicio", arg_texto)],
+            resto=True,
+            uso="/reservar 2025-11-20 10:00 corte",
+            descripcion="sacar un turno",
+        ))
+        self.registrar(Comando(
+            "/mios", self.cmd_mios,
+            uso="/mios",
+            descripcion="ver tus turnos y sus tickets",
+        ))
+        self.registrar(Comando(
+            "/cancelar", self.cmd_cancelar,
+            args=[("ticket", arg_ticket)],
+            uso="/cancelar T-000042",
+            descripcion="cancelar un turno",
+        ))
+        self.registrar(Comando(
+            "/reprogramar", self.cmd_reprogramar,
+            args=[("ticket", arg_ticket), ("fecha", arg_fecha), ("hora", arg_hora)],
+            uso="/reprogramar T-000042 2025-11-21 11:30",
+            descripcion="mover un turno a otro día/hora",
+        ))
+        if self.espera is not None:
+            self.registrar(Comando(
+                "/esperar", self.cmd_esperar,
+                args=[("fecha", arg_fecha), ("desde", arg_hora), ("hasta", arg_hora)],
+                uso="/esperar 2025-11-20 10:00 12:00",
+                descripcion="avisarte si se libera un turno en ese rango",
+            ))
+            self.registrar(Comando(
+                "/noesperar", self.cmd_noesperar,
+                args=[("espera_id", arg_entero)],
+                uso="/noesperar 12",
+                descripcion="salir de la lista de espera",
+            ))
+
+    # ---------- Despacho ----------
+    async def despachar(self, chat_id: int, text: str) -> None:
+        texto = (text or "").strip()
+        cabeza, _, resto = texto.partition(" ")
+        # "/mios@MiBot" -> "/mios" (así llegan los comandos en grupos)
+        nombre = cabeza.split("@", 1)[0].lower()
+
+        comando = self._comandos.get(nombre)
+        if comando is None:
+            await self.transporte.enviar(
+                chat_id,
+                "No entendí el comando.\n"
+                "Usá /start para ver las opciones disponibles.",
+            )
+            return
+
+        respuesta = await self._ejecutar(comando, chat_id, resto)
+        await self.transporte.enviar(chat_id, respuesta)
+
+    async def _ejecutar(self, comando: Comando, chat_id: int, texto_args: str) -> str:
+        metricas = self._metricas[comando.nombre]
+        inicio = time.perf_counter()
+        try:
+            try:
+                args = comando.parsear(texto_args)
+            except ArgumentoInvalido as e:
+                metricas["errores"] += 1
+                return f"⚠️ {e}\nFormato correcto:\n{comando.uso}"
+            with span(f"bot{comando.nombre}"):
+                return await comando.handler(chat_id, **args)
+        except SlotOcupadoError:
+            metricas["errores"] += 1
+            return "❌ Ese turno ya está ocupado."
+        except LookupError:
+            metricas["errores"] += 1
+            return "❌ No encontré ese ticket entre tus turnos."
+        except RuntimeError:
+            # choque con otro turno al reprogramar
+            metricas["errores"] += 1
+            return "❌ Ese horario ya está ocupado."
+        except ValueError as e:
+            metricas["errores"] += 1
+            return f"⚠️ Error: {e}"
+        except Exception as e:
+            metricas["errores"] += 1
+            log.exception("bot: %s falló", comando.nombre)
+            return f"⚠️ Error inesperado: {type(e).__name__}: {e}"
+        finally:
+            ms = (time.perf_counter() - inicio) * 1000
+            metricas["llamadas"] += 1
+            metricas["total_ms"] += ms
+            if ms > metricas["max_ms"]:
+                metricas["max_ms"] = ms
+
+    def metricas(self) -> dict[str, dict[str, float]]:
+        return {
+            nombre: {
+                **m,
+                "total_ms": round(m["total_ms"], 3),
+                "max_ms": round(m["max_ms"], 3),
+                "promedio_ms": round(m["total_ms"] / m["llamadas"], 3) if m["llamadas"] else 0.0,
+            }
+            for nombre, m in self._metricas.items()
+        }
+
+    # ---------- Helpers ----------
+    def _turno_propio(self, chat_id: int, ticket: str) -> dict:
+        """
+        Turno del ticket si pertenece a este chat; si no, LookupError
+        (no confirmamos que exista un ticket ajeno).
+        """
+        turno = self.service.get_por_ticket(ticket)
+        if not turno or turno.get("contacto_id") != str(chat_id):
+            raise LookupError("no_encontrado")
+        return turno
+
+    # ---------- Handlers ----------
+    async def cmd_start(self, chat_id: int) -> str:
+        lineas = [
+            f"• {c.uso} — {c.descripcion}"
+            for c in self._comandos.values()
+            if c.nombre != "/start"
+        ]
+        return "👋 ¡Hola! Soy tu bot de turnos.\n\nComandos disponibles:\n" + "\n".join(lineas)
+
+    async def cmd_disponibilidad(self, chat_id: int, fecha: str, servicio: str | None = None) -> str:
+        data = self.service.get_disponibilidad(fecha=fecha, servicio=servicio)
+        libres = data.get("libres", [])
+        if not libres:
+            return f"❌ No hay turnos disponibles el {data['fecha']}."
+        lista = "\n".join(f"• {h}" for h in libres)
+        return f"📅 Turnos disponibles el {data['fecha']}:\n\n{lista}"
+
+    async def cmd_reservar(self, chat_id: int, fecha: str, hora: str, servicio: str) -> str:
+        result = self.service.reservar({
+            "nombre_cliente": f"tg_{chat_id}",
+            "telefono_cliente": str(chat_id),
+            "fecha_turno": fecha,
+            "hora_turno": hora,
+            "servicio": servicio,
+        })
+        ticket = result.get("ticket")
+        extra = f"\nTicket: {ticket}" if ticket else ""
+        return f"✅ Turno reservado:\n{fecha} {hora} - {servicio}{extra}"
+
+    async def cmd_mios(self, chat_id: int) -> str:
+        items = self.service.listar_por_contacto(str(chat_id))
+        if not items:
+            return "No tenés turnos reservados."
+        lista = "\n".join(
+            f"• {t['ticket']}: {t['fecha']} {t['hora']} - {t['servicio']}" for t in items
+        )
+        return f"🗓 Tus turnos:\n\n{lista}"
+
+    async def cmd_cancelar(self, chat_id: int, ticket: str) -> str:
+        turno = self._turno_propio(chat_id, ticket)
+        if not self.service.delete_por_ticket(ticket):
+            raise LookupError("no_encontrado")
+        return f"🗑 Turno cancelado:\n{turno['fecha']} {turno['hora']} - {turno['servicio']}"
+
+    async def cmd_reprogramar(self, chat_id: int, ticket: str, fecha: str, hora: str) -> str:
+        self._turno_propio(chat_id, ticket)
+        actualizado = self.service.patch_por_ticket(ticket, {"fecha": fecha, "hora": hora})
+        if not actualizado:
+            raise LookupError("no_encontrado")
+        return (
+            "🔁 Turno reprogramado:\n"
+            f"{actualizado['fecha']} {actualizado['hora']} - {actualizado['servicio']}\n"
+            f"Ticket: {actualizado['ticket']}"
+        )
+
+    async def cmd_esperar(self, chat_id: int, fecha: str, desde: str, hasta: str) -> str:
+        espera_id = self.espera.registrar(str(chat_id), chat_id, fecha, desde, hasta)
+        return (
+            f"📝 Te anoté en la lista de espera (#{espera_id}) para el {fecha} "
+            f"entre {desde} y {hasta}.\n"
+            f"Si se libera un turno te aviso. Para salir: /noesperar {espera_id}"
+        )
+
+    async def cmd_noesperar(self, chat_id: int, espera_id: int) -> str:
+        if not self.espera.baja(espera_id, str(chat_id)):
+            return "❌ No encontré esa espera entre las tuyas."
+        return f"👌 Listo, saliste de la lista de espera (#{espera_id})."
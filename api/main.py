@@ -1,8 +1,9 @@
 # api/main.py
 from typing import Optional, Any, Dict
 
+import logging
+import math
 import os
-import sqlite3
 
 from dotenv import load_dotenv
 from fastapi import (
@@ -14,19 +15,70 @@ from fastapi import (
     Request,
 )
 from pydantic import BaseModel, Field
-import httpx
 
-from repo.sqlite_repo import SQLiteRepository
+from repo.sqlite_repo import SQLiteRepository, conectar
 from domain.service import TurnoService, SlotOcupadoError
+from domain.archivo import ArchivadorTurnos
+from api.rate_limit import RateLimiter, TokenBucketLimiter
+from api.respuestas import RespuestaJSON, CacheDisponibilidad
+from api.telegram import TelegramClient
+from api.bot import RouterComandos
+from api.sincronizacion import CanalCambios, LiderLock
+from api.trazas import MiddlewareTrazas
+from domain.tracing import trazador
+from domain.recordatorios import ProgramadorRecordatorios
+from domain.espera import ListaEspera
+from domain.models import (
+    disponibilidadResponde,
+    misTurnosResponde,
+    reservaResponde,
+    turnoResponde,
+)
 
 # ----------------- Configuración básica -----------------
 
 load_dotenv()
 
+log = logging.getLogger(__name__)
+
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
 ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "dev")
 
+# Base de datos y modo multi-proceso (uvicorn --workers N con MULTIPROCESO=1)
+DB_PATH = os.getenv("TURNOS_DB_PATH", "turnos.db")
+MULTIPROCESO = os.getenv("MULTIPROCESO", "0") == "1"
+
+# Trazas: fracción de requests trazados, umbral/muestreo del log de
+# consultas lentas y archivo JSONL opcional donde volcarlos
+TRAZAS_MUESTREO = float(os.getenv("TRAZAS_MUESTREO", "0.01"))
+TRAZAS_LENTAS_MS = float(os.getenv("TRAZAS_LENTAS_MS", "50"))
+TRAZAS_LENTAS_MUESTREO = float(os.getenv("TRAZAS_LENTAS_MUESTREO", "1"))
+TRAZAS_ARCHIVO = os.getenv("TRAZAS_ARCHIVO", "")
+
+# Archivado: turnos con más de N días pasan al histórico (turnos_archivo)
+ARCHIVO_DIAS = int(os.getenv("ARCHIVO_DIAS", "30"))
+ARCHIVO_BATCH = int(os.getenv("ARCHIVO_BATCH", "500"))
+ARCHIVO_INTERVALO_SEG = int(os.getenv("ARCHIVO_INTERVALO_SEG", "3600"))
+
+# Rate limiting por ruta: "cantidad/segundos" (vacío = sin límite).
+# RATE_RESERVAR es por teléfono; por IP el límite es más holgado porque
+# detrás de un proxy muchos clientes comparten IP (ver _ip_cliente).
+RATE_RESERVAR = os.getenv("RATE_RESERVAR", "5/60")
+RATE_RESERVAR_IP = os.getenv("RATE_RESERVAR_IP", "60/60")
+RATE_WEBHOOK = os.getenv("RATE_WEBHOOK", "20/60")
+# Altas y bajas de la lista de espera: por contacto y por IP
+RATE_ESPERA = os.getenv("RATE_ESPERA", "10/60")
+RATE_ESPERA_IP = os.getenv("RATE_ESPERA_IP", "60/60")
+
+# Recordatorios por Telegram (1 día y 2 horas antes). "0" los apaga.
+RECORDATORIOS = os.getenv("RECORDATORIOS", "1") == "1"
+
+# Lista de espera: cuántos segundos se retiene un slot liberado para quien lo esperaba
+ESPERA_RETENCION_SEG = int(os.getenv("ESPERA_RETENCION_SEG", "900"))
+# Esperas vigentes (activas u ofrecidas) que puede tener un mismo contacto/chat
+ESPERA_MAX_POR_CONTACTO = int(os.getenv("ESPERA_MAX_POR_CONTACTO", "5"))
+
 if not BOT_TOKEN:
     raise RuntimeError("BOT_TOKEN no está definido en el .env")
 
@@ -35,14 +87,125 @@ if not WEBHOOK_SECRET:
 
 TG_API = f"https://api.telegram.org/bot{BOT_TOKEN}"
 
-app = FastAPI(title="Turnos API")
+app = FastAPI(title="Turnos API", default_response_class=RespuestaJSON)
 
-# Conexión SQLite (thread-safe para dev)
-conn = sqlite3.connect("turnos.db", check_same_thread=False)
+trazador.configurar(
+    muestreo=TRAZAS_MUESTREO,
+    lentas_ms=TRAZAS_LENTAS_MS,
+    lentas_muestreo=TRAZAS_LENTAS_MUESTREO,
+    archivo=TRAZAS_ARCHIVO,
+)
+app.add_middleware(MiddlewareTrazas, token_forzar=ADMIN_TOKEN)
+
+# Conexión SQLite: una por proceso (WAL + busy_timeout, ver repo.sqlite_repo.conectar)
+conn = conectar(DB_PATH)
 
 # --- wiring (singleton simple) ---
 _repo = SQLiteRepository(conn)
 _service = TurnoService(_repo)
+_cache_disponibilidad = CacheDisponibilidad()
+_service.suscribir(_cache_disponibilidad.on_cambio)
+_telegram = TelegramClient(TG_API)
+_recordatorios = ProgramadorRecordatorios(_repo, _telegram.enviar)
+if RECORDATORIOS:
+    _service.suscribir(_recordatorios.on_cambio)
+_espera = ListaEspera(
+    _repo,
+    _service,
+    _telegram.enviar,
+    retencion_seg=ESPERA_RETENCION_SEG,
+    max_por_contacto=ESPERA_MAX_POR_CONTACTO,
+)
+_service.retenciones = _espera
+_service.suscribir(_espera.on_cambio)
+_bot = RouterComandos(_service, _telegram, espera=_espera)
+_archivador = ArchivadorTurnos(
+    _repo,
+    dias=ARCHIVO_DIAS,
+    batch_size=ARCHIVO_BATCH,
+    intervalo_seg=ARCHIVO_INTERVALO_SEG,
+)
+
+_limiter = RateLimiter({
+    "reservar": RATE_RESERVAR,
+    "reservar_ip": RATE_RESERVAR_IP,
+    "espera": RATE_ESPERA,
+    "espera_ip": RATE_ESPERA_IP,
+    "webhook": RATE_WEBHOOK,
+})
+# Aviso "más despacio" al chat: como mucho uno por minuto, para no sumar spam
+_limiter_aviso = TokenBucketLimiter(1, 1 / 60)
+
+# Con varios workers: el líder corre los jobs y el canal replica los cambios
+_lider = LiderLock(f"{DB_PATH}.lider")
+_canal = CanalCambios(_repo, _service) if MULTIPROCESO else None
+
+
+def _ip_cliente(request: Request) -> str:
+    # Detrás de un reverse proxy hay que levantar uvicorn con
+    # --proxy-headers --forwarded-allow-ips=<IP del proxy>: así request.client
+    # es el cliente real (X-Forwarded-For) y no el proxy. No leemos el header
+    # a mano porque cualquiera podría mandarlo.
+    return request.client.host if request.client else ""
+
+
+def _chequear_limite(request: Request, ruta: str, clave: str) -> None:
+    """
+    Límite de la ruta por IP ("<ruta>_ip") y por la clave del cliente
+    (teléfono/contacto). Un rechazo no descuenta de la otra; 429 con Retry-After.
+    """
+    espera = _limiter.permitir_varias(
+        (f"{ruta}_ip", f"ip:{_ip_cliente(request)}"),
+        (ruta, clave),
+    )
+    if espera:
+        raise HTTPException(
+            status_code=429,
+            detail="demasiadas_solicitudes",
+            headers={"Retry-After": str(math.ceil(espera))},
+        )
+
+
+# ----------------- Jobs de fondo -----------------
+
+def _iniciar_jobs_lider():
+    _archivador.iniciar()
+    _espera.iniciar()
+    if RECORDATORIOS:
+        _recordatorios.iniciar()
+
+
+@app.on_event("startup")
+async def _iniciar_jobs():
+    if MULTIPROCESO:
+        # Elección de líder: sólo uno corre los jobs; el canal le trae las
+        # escrituras de los demás workers
+        if _lider.intentar():
+            _iniciar_jobs_lider()
+        _canal.iniciar(_lider, _iniciar_jobs_lider)
+        return
+
+    # Un solo proceso: corre sus jobs. Si otro ya tiene el lock son varios
+    # workers sin MULTIPROCESO=1: cada uno sólo ve sus propias escrituras
+    # (recordatorios y ofertas de la lista de espera de los demás no le llegan)
+    if not _lider.intentar():
+        log.error(
+            "hay otro proceso usando %s sin MULTIPROCESO=1: con uvicorn --workers N "
+            "hay que activarlo para que los cambios lleguen a todos los workers",
+            DB_PATH,
+        )
+    _iniciar_jobs_lider()
+
+
+@app.on_event("shutdown")
+async def _detener_jobs():
+    await _archivador.detener()
+    await _recordatorios.detener()
+    await _espera.detener()
+    await _telegram.cerrar()
+    if _canal is not None:
+        await _canal.detener()
+    _lider.soltar()
 
 
 # ----------------- Modelos de entrada -----------------
@@ -56,6 +219,14 @@ class ReservaIn(BaseModel):
     estado: str = "reservado"  # valor por defecto útil
 
 
+class EsperaIn(BaseModel):
+    contacto: str
+    chat_id: int = Field(..., description="Chat de Telegram para avisarle")
+    fecha: str   # YYYY-MM-DD
+    desde: str   # HH:MM
+    hasta: str   # HH:MM
+
+
 class TurnoPatchIn(BaseModel):
     # Todos opcionales: PATCH actualiza sólo lo que venga
     fecha: Optional[str] = Field(default=None, description="YYYY-MM-DD")
@@ -74,35 +245,30 @@ async def health():
     return {"status": "ok"}
 
 
-@app.get("/disponibilidad")
+@app.get("/disponibilidad", response_model=disponibilidadResponde)
 async def disponibilidad(
     fecha: str = Query(..., description="YYYY-MM-DD"),
     servicio: Optional[str] = Query(None),
 ):
     try:
-        return _service.get_disponibilidad(fecha=fecha, servicio=servicio)
+        # Bytes ya serializados (cacheados por fecha mientras no haya cambios)
+        return RespuestaJSON(
+            _cache_disponibilidad.obtener(_service, fecha=fecha, servicio=servicio)
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.post("/reservar")
-async def reservar(payload: ReservaIn):
+@app.post("/reservar", response_model=reservaResponde)
+async def reservar(payload: ReservaIn, request: Request):
     """
-    Crea un turno. Ahora devuelve también id y ticket si el service lo provee.
+    Crea un turno. Devuelve id y ticket para cancelar o reprogramar después.
     """
+    _chequear_limite(request, "reservar", f"tel:{payload.telefono_cliente}")
+
     try:
         result = _service.reservar(payload.model_dump())
-
-        # Soporta ambos retornos mientras migrás el service:
-        # - dict con {"id","ticket","turno": {...}}
-        # - modelo Pydantic Turno (legacy)
-        if isinstance(result, dict) and ("ticket" in result or "id" in result):
-            # Forma nueva (recomendada)
-            return {"status": "reservado", **result}
-        else:
-            # Forma legacy para no romperte mientras migrás
-            turno_dict = getattr(result, "model_dump", lambda: result)()
-            return {"status": "reservado", "turno": turno_dict}
+        return RespuestaJSON(reservaResponde(**result))
 
     except SlotOcupadoError:
         raise HTTPException(status_code=409, detail="ocupado")
@@ -120,19 +286,102 @@ async def admin_reset(
     if token != ADMIN_TOKEN:
         raise HTTPException(status_code=403, detail="Forbidden")
 
+    # El service emite "reset": limpia caches acá y, con MULTIPROCESO, en los demás workers
     if mode == "drop":
-        _repo.reset(drop=True)
+        _service.reset(drop=True)
         return {"ok": True, "mode": "drop", "deleted": 0}
     else:
-        deleted = _repo.reset(drop=False)
+        deleted = _service.reset(drop=False)
         return {"ok": True, "mode": "truncate", "deleted": deleted}
 
 
+@app.get("/admin/archivo")
+async def admin_archivo_estado(
+    token: Optional[str] = Header(None, alias="X-Admin-Token"),
+):
+    """
+    Progreso del archivado: corridas, filas movidas y tamaño de cada tabla.
+    """
+    if token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return _archivador.estado()
+
+
+@app.post("/admin/archivo")
+async def admin_archivo_correr(
+    token: Optional[str] = Header(None, alias="X-Admin-Token"),
+):
+    """
+    Fuerza una corrida del archivado ahora (sin esperar al intervalo).
+    """
+    if token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if _archivador.metricas["en_curso"]:
+        raise HTTPException(status_code=409, detail="archivado_en_curso")
+    movidos = await _archivador.correr_una_vez()
+    return {"ok": True, "movidos": movidos, **_archivador.estado()}
+
+
+@app.get("/admin/recordatorios")
+async def admin_recordatorios_estado(
+    token: Optional[str] = Header(None, alias="X-Admin-Token"),
+):
+    """
+    Recordatorios pendientes en el heap y contadores de envío.
+    """
+    if token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return {"activos": RECORDATORIOS, **_recordatorios.estado()}
+
+
+@app.get("/admin/bot")
+async def admin_bot_metricas(
+    token: Optional[str] = Header(None, alias="X-Admin-Token"),
+):
+    """
+    Llamadas, errores y tiempos (ms) por comando del bot.
+    """
+    if token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return _bot.metricas()
+
+
+@app.get("/admin/proceso")
+async def admin_proceso(
+    token: Optional[str] = Header(None, alias="X-Admin-Token"),
+):
+    """
+    Qué worker atendió, si es el líder y cuántos cambios replicó.
+    """
+    if token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return {
+        "pid": os.getpid(),
+        "db": DB_PATH,
+        "lider": _lider.es_lider,
+        "multiproceso": MULTIPROCESO,
+        "canal": _canal.metricas if _canal is not None else None,
+    }
+
+
+@app.get("/admin/trazas")
+async def admin_trazas(
+    limite: int = Query(50, ge=1, le=1000),
+    token: Optional[str] = Header(None, alias="X-Admin-Token"),
+):
+    """
+    Últimas trazas muestreadas y consultas lentas de este proceso.
+    """
+    if token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return trazador.volcar(limite)
+
+
 # ============================================================
 #           Endpoints por TICKET (telegram-friendly)
 # ============================================================
 
-@app.get("/turnos/ticket/{ticket}")
+@app.get("/turnos/ticket/{ticket}", response_model=turnoResponde)
 async def get_por_ticket(ticket: str = Path(..., description="Ticket legible")):
     """
     Devuelve un turno por ticket. El service debe decodificar ticket -> rowid.
@@ -141,8 +390,8 @@ async def get_por_ticket(ticket: str = Path(..., description="Ticket legible")):
         data: Optional[Dict[str, Any]] = _service.get_por_ticket(ticket)
         if not data:
             raise HTTPException(status_code=404, detail="no_encontrado")
-        # Se espera que el service ya adjunte "ticket" y "id" si corresponde
-        return data
+        # El service ya adjunta "ticket" e "id"
+        return RespuestaJSON(turnoResponde(**data))
     except ValueError as e:
         # p.ej., ticket mal formado
         raise HTTPException(status_code=400, detail=str(e))
@@ -168,7 +417,7 @@ async def delete_por_ticket(ticket: str = Path(..., description="Ticket legible"
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.patch("/turnos/ticket/{ticket}")
+@app.patch("/turnos/ticket/{ticket}", response_model=turnoResponde)
 async def patch_por_ticket(
     ticket: str = Path(..., description="Ticket legible"),
     cambios: TurnoPatchIn = ...,
@@ -185,7 +434,7 @@ async def patch_por_ticket(
         actualizado = _service.patch_por_ticket(ticket, payload)
         if not actualizado:
             raise HTTPException(status_code=404, detail="no_encontrado")
-        return actualizado
+        return RespuestaJSON(turnoResponde(**actualizado))
 
     except LookupError:
         raise HTTPException(status_code=404, detail="no_encontrado")
@@ -198,32 +447,70 @@ async def patch_por_ticket(
 
 # ------------ Mis turnos por contacto ------------
 
-@app.get("/turnos/mios")
+@app.get("/turnos/mios", response_model=misTurnosResponde)
 async def turnos_por_contacto(
-    contacto: str = Query(..., description="Teléfono del cliente")
+    contacto: str = Query(..., description="Teléfono del cliente"),
+    historial: bool = Query(False, description="Incluir turnos archivados"),
 ):
     """
     Lista turnos de un contacto (teléfono).
     Útil para que el bot muestre 'mis turnos' y el usuario elija uno por ticket.
+    Con ?historial=true suma los turnos ya archivados (sin ticket).
+    """
+    try:
+        items = _service.listar_por_contacto(contacto, historial=historial)
+        # El service adjunta "ticket" por cada item (None si está archivado)
+        return RespuestaJSON(misTurnosResponde(contacto=contacto, turnos=items))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# ------------ Lista de espera ------------
+
+@app.post("/espera", status_code=201)
+async def alta_espera(payload: EsperaIn, request: Request):
     """
+    Anota al contacto para un rango horario de un día. Si se libera un slot
+    del rango se le ofrece por Telegram (al chat_id) y se le retiene.
+    """
+    _chequear_limite(request, "espera", f"tel:{payload.contacto}")
     try:
-        items = _service.listar_por_contacto(contacto)
-        # Se espera que el service adjunte "ticket" por cada item.
-        return {"contacto": contacto, "turnos": items}
+        espera_id = _espera.registrar(
+            payload.contacto, payload.chat_id, payload.fecha, payload.desde, payload.hasta
+        )
+        return {"id": espera_id, "fecha": payload.fecha, "desde": payload.desde, "hasta": payload.hasta}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.delete("/espera/{espera_id}", status_code=204)
+async def baja_espera(
+    request: Request,
+    espera_id: int = Path(...),
+    contacto: str = Query(..., description="Teléfono del cliente"),
+):
+    _chequear_limite(request, "espera", f"tel:{contacto}")
+    if not _espera.baja(espera_id, contacto):
+        raise HTTPException(status_code=404, detail="no_encontrado")
+    return  # 204
+
+
+@app.get("/admin/espera")
+async def admin_espera_estado(
+    token: Optional[str] = Header(None, alias="X-Admin-Token"),
+):
+    if token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return _espera.estado()
+
+
 # ============================================================
 #           Conexión bot Telegram (webhook)
 # ============================================================
 
 async def tg_send(chat_id: int, text: str):
-    async with httpx.AsyncClient() as client:
-        await client.post(
-            f"{TG_API}/sendMessage",
-            json={"chat_id": chat_id, "text": text},
-        )
+    # Cliente compartido (pool de conexiones + límite de mensajes por segundo)
+    await _telegram.enviar(chat_id, text)
 
 
 @app.post("/telegram/webhook")
@@ -244,89 +531,13 @@ async def telegram_webhook(
     chat_id = message["chat"]["id"]
     text = (message.get("text") or "").strip()
 
-    # 3. Router de comandos
-    if text.startswith("/start"):
-        await tg_send(
-            chat_id,
-            "👋 ¡Hola! Soy tu bot de turnos.\n\n"
-            "Comandos disponibles:\n"
-            "• /disponibilidad YYYY-MM-DD\n"
-            "• /reservar YYYY-MM-DD HH:MM servicio\n"
-            "• /cancelar YYYY-MM-DD HH:MM\n",
-        )
-
-    elif text.startswith("/disponibilidad"):
-        partes = text.split()
-        if len(partes) < 2:
-            await tg_send(
-                chat_id,
-                "Formato correcto:\n"
-                "/disponibilidad 2025-11-20",
-            )
-        else:
-            fecha = partes[1]
-            servicio = partes[2] if len(partes) > 2 else None
-
-            try:
-                data = _service.get_disponibilidad(fecha=fecha, servicio=servicio)
-                libres = data.get("libres", [])
-
-                if not libres:
-                    await tg_send(chat_id, f"❌ No hay turnos disponibles el {data['fecha']}.")
-                else:
-                    lista = "\n".join(f"• {h}" for h in libres)
-                    await tg_send(
-                        chat_id,
-                        f"📅 Turnos disponibles el {data['fecha']}:\n\n{lista}",
-                    )
-
-            except ValueError as e:
-                await tg_send(chat_id, f"⚠️ Error: {str(e)}")
-            except Exception as e:
-                await tg_send(chat_id, f"⚠️ Error inesperado: {type(e).__name__}: {e}")
-
-    elif text.startswith("/reservar"):
-        # /reservar 2025-11-20 10:00 Corte de pelo
-        partes = text.split(maxsplit=3)
-        if len(partes) < 4:
-            await tg_send(
-                chat_id,
-                "Formato correcto:\n"
-                "/reservar 2025-11-20 10:00 Corte de pelo",
-            )
-        else:
-            fecha, hora, servicio = partes[1], partes[2], partes[3]
-            try:
-                data = {
-                    "nombre_cliente": f"tg_{chat_id}",
-                    "telefono_cliente": str(chat_id),
-                    "fecha_turno": fecha,
-                    "hora_turno": hora,
-                    "servicio": servicio,
-                }
-                _service.reservar(data)
-                await tg_send(
-                    chat_id,
-                    f"✅ Turno reservado:\n{fecha} {hora} - {servicio}",
-                )
-            except SlotOcupadoError:
-                await tg_send(chat_id, "❌ Ese turno ya está ocupado.")
-            except Exception as e:
-                await tg_send(chat_id, f"⚠️ Error al reservar: {e}")
-
-    elif text.startswith("/cancelar"):
-        await tg_send(
-            chat_id,
-            "La función /cancelar todavía está en desarrollo. 🤓\n" 
-            "Por ahora solo soportamos /disponibilidad y /reservar."
-        )
-
+    # A Telegram siempre le respondemos 200 (si no, reintenta el update)
+    if _limiter.permitir("webhook", f"chat:{chat_id}"):
+        if _limiter_aviso.permitir(f"chat:{chat_id}"):
+            await tg_send(chat_id, "⏳ Estás enviando muchos mensajes. Probá de nuevo en un rato.")
+        return {"ok": True}
 
-    else:
-        await tg_send(
-            chat_id,
-            "No entendí el comando.\n"
-            "Usá /start para ver las opciones disponibles.",
-        )
+    # 3. Router de comandos (tabla de despacho en api/bot.py)
+    await _bot.despachar(chat_id, text)
 
     return {"ok": True}
@@ -0,0 +1,168 @@
+# api/rate_limit.py
+# Rate limiting en proceso con token bucket (por chat_id, teléfono o IP).
+import time
+from collections import OrderedDict
+
+
+def parse_limite(spec: str) -> tuple[float, float]:
+    """
+    "10/60" -> capacidad 10, recarga 10 tokens cada 60 s.
+    Retorna (capacidad, tokens_por_segundo).
+    """
+    try:
+        cant, seg = spec.split("/", 1)
+        capacidad = float(cant)
+        segundos = float(seg)
+    except Exception:
+        raise ValueError(f"limite_invalido: {spec!r}")
+    if capacidad <= 0 or segundos <= 0:
+        raise ValueError(f"limite_invalido: {spec!r}")
+    return capacidad, capacidad / segundos
+
+
+class TokenBucketLimiter:
+    """
+    Un bucket por clave, guardado como [tokens, ultimo_ts] en un OrderedDict.
+
+    - permitir() es O(1): recarga perezosa (sólo se calcula al consultar la clave).
+    - Las claves se mantienen en orden de último uso, así que las inactivas
+      quedan al principio y se desalojan en O(1) amortizado.
+    - max_claves acota la memoria aunque lleguen muchas claves distintas.
+    """
+
+    def __init__(
+        self,
+        capacidad: float,
+        tokens_por_seg: float,
+        idle_seg: float = 600,
+        max_claves: int = 100_000,
+        reloj=time.monotonic,
+    ):
+        self.capacidad = capacidad
+        self.tokens_por_seg = tokens_por_seg
+        self.idle_seg = idle_seg
+        self.max_claves = max_claves
+        self._reloj = reloj
+        self._buckets: OrderedDict[str, list[float]] = OrderedDict()
+
+    @classmethod
+    def desde_spec(cls, spec: str, **kwargs) -> "TokenBucketLimiter":
+        capacidad, tokens_por_seg = parse_limite(spec)
+        return cls(capacidad, tokens_por_seg, **kwargs)
+
+    def permitir(self, clave: str, costo: float = 1.0) -> bool:
+        bucket = self._recargar(clave, self._reloj())
+        if bucket[0] >= costo:
+            bucket[0] -= costo
+            return True
+        return False
+
+    def permitir_todas(self, claves, costo: float = 1.0) -> float:
+        """
+        Descuenta `costo` de cada clave (las vacías se ignoran) sólo si todas
+        lo tienen; si alguna no alcanza no descuenta nada. Retorna 0 si pasó,
+        o los segundos hasta que la más atrasada se recargue.
+        """
+        ahora = self._reloj()
+        buckets = []
+        faltan = 0.0
+        for clave in claves:
+            if not clave:
+                continue
+            bucket = self._recargar(clave, ahora)
+            if costo - bucket[0] > faltan:
+                faltan = costo - bucket[0]
+            buckets.append(bucket)
+        if faltan > 0:
+            return faltan / self.tokens_por_seg
+        for bucket in buckets:
+            bucket[0] -= costo
+        return 0.0
+
+    def reintentar_en(self, clave: str, costo: float = 1.0) -> float:
+        """
+        Segundos hasta que la clave tenga `costo` tokens (0 si ya los tiene).
+        """
+        bucket = self._buckets.get(clave)
+        if bucket is None:
+            return 0.0
+        tokens = bucket[0] + (self._reloj() - bucket[1]) * self.tokens_por_seg
+        faltan = costo - min(tokens, self.capacidad)
+        return max(0.0, faltan / self.tokens_por_seg)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    # ---------- Helpers ----------
+    def _recargar(self, clave: str, ahora: float) -> list[float]:
+        bucket = self._buckets.get(clave)
+        if bucket is None:
+            self._desalojar(ahora)
+            bucket = [self.capacidad, ahora]
+            self._buckets[clave] = bucket
+        else:
+            # Recarga perezosa
+            tokens = bucket[0] + (ahora - bucket[1]) * self.tokens_por_seg
+            bucket[0] = tokens if tokens < self.capacidad else self.capacidad
+            bucket[1] = ahora
+            self._buckets.move_to_end(clave)
+        return bucket
+
+    def _desalojar(self, ahora: float) -> None:
+        buckets = self._buckets
+        # Las más viejas están al principio: cortamos en la primera activa
+        while buckets:
+            clave, bucket = next(iter(buckets.items()))
+            if ahora - bucket[1] < self.idle_seg and len(buckets) < self.max_claves:
+                break
+            buckets.popitem(last=False)
+
+
+class RateLimiter:
+    """
+    Agrupa un TokenBucketLimiter por ruta. Las rutas sin límite configurado pasan siempre.
+    """
+
+    def __init__(self, limites: dict[str, str], **kwargs):
+        self._por_ruta = {
+            ruta: TokenBucketLimiter.desde_spec(spec, **kwargs)
+            for ruta, spec in limites.items()
+            if spec
+        }
+
+    def permitir(self, ruta: str, *claves: str) -> float:
+        """
+        Consume un token de cada clave para la ruta, sólo si todas lo tienen:
+        un request rechazado no descuenta nada (bloqueado por IP no gasta el
+        bucket del teléfono, ni al revés).
+        Retorna 0 si pasa, o los segundos a esperar si alguna clave está agotada.
+        """
+        limiter = self._por_ruta.get(ruta)
+        if limiter is None:
+            return 0.0
+        return limiter.permitir_todas(claves)
+
+    def permitir_varias(self, *pares: tuple[str, str]) -> float:
+        """
+        Como permitir(), pero cada clave con el límite de su ruta, p.ej.
+        ("reservar_ip", "ip:1.2.3.4"), ("reservar", "tel:11..."): pasa y
+        descuenta sólo si todas tienen token. Rutas sin límite se ignoran.
+        """
+        buckets = []
+        espera = 0.0
+        for ruta, clave in pares:
+            limiter = self._por_ruta.get(ruta)
+            if limiter is None or not clave:
+                continue
+            bucket = limiter._recargar(clave, limiter._reloj())
+            if bucket[0] < 1:
+                espera = max(espera, (1 - bucket[0]) / limiter.tokens_por_seg)
+            buckets.append(bucket)
+        if espera > 0:
+            return espera
+        for bucket in buckets:
+            bucket[0] -= 1
+        return 0.0
+
+    def claves_activas(self) -> dict[str, int]:
+        return {ruta: len(lim) for ruta, lim in self._por_ruta.items()}
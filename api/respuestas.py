@@ -0,0 +1,100 @@
+# api/respuestas.py
+# Respuestas JSON rápidas: serializan modelos Pydantic directo a bytes
+# (pydantic-core) sin pasar por jsonable_encoder de FastAPI.
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any
+from zoneinfo import ZoneInfo
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from domain.models import disponibilidadResponde
+
+TZ = ZoneInfo("America/Argentina/Buenos_Aires")
+
+
+class RespuestaJSON(JSONResponse):
+    """
+    Acepta un modelo Pydantic, bytes ya serializados o tipos JSON simples.
+    Los endpoints la devuelven directamente, así FastAPI no vuelve a validar
+    ni a codificar el contenido (response_model queda sólo para la doc).
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        if isinstance(content, BaseModel):
+            return content.model_dump_json().encode("utf-8")
+        return json.dumps(
+            content, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+
+
+class CacheDisponibilidad:
+    """
+    Bytes de /disponibilidad ya serializados por fecha.
+
+    Sólo se cachean fechas futuras: la de hoy cambia con la hora (se filtran
+    los slots pasados) y las pasadas no tienen interés. Se invalida por fecha
+    con los eventos de cambio del TurnoService, y al leer se descarta la
+    entrada si la fecha dejó de ser futura (pasó la medianoche).
+    """
+
+    def __init__(self, max_fechas: int = 512, reloj=time.time):
+        self.max_fechas = max_fechas
+        self._reloj = reloj
+        self._bytes: OrderedDict[str, bytes] = OrderedDict()
+        self._hoy = ""
+        self._hoy_vence = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def hoy(self) -> str:
+        # Se recalcula una vez por día: en cada hit sólo se compara un float
+        ahora = self._reloj()
+        if ahora >= self._hoy_vence:
+            dt = datetime.fromtimestamp(ahora, TZ)
+            medianoche = (dt + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+            self._hoy = dt.strftime("%Y-%m-%d")
+            self._hoy_vence = medianoche.timestamp()
+        return self._hoy
+
+    def obtener(self, service, fecha: str, servicio: str | None = None) -> bytes:
+        cacheado = self._bytes.get(fecha)
+        if cacheado is not None:
+            if fecha > self.hoy():
+                self.hits += 1
+                self._bytes.move_to_end(fecha)
+                return cacheado
+            del self._bytes[fecha]
+
+        self.misses += 1
+        data = service.get_disponibilidad(fecha=fecha, servicio=servicio)
+        payload = disponibilidadResponde(**data).model_dump_json().encode("utf-8")
+
+        # get_disponibilidad ya validó el formato; sólo cacheamos la forma
+        # canónica (la misma que traen los eventos) para poder invalidarla
+        canonica = datetime.strptime(fecha, "%Y-%m-%d").strftime("%Y-%m-%d")
+        if fecha == canonica and fecha > self.hoy():
+            self._bytes[fecha] = payload
+            if len(self._bytes) > self.max_fechas:
+                self._bytes.popitem(last=False)
+        return payload
+
+    def invalidar(self, fecha: str) -> None:
+        self._bytes.pop(fecha, None)
+
+    def limpiar(self) -> None:
+        self._bytes.clear()
+
+    def on_cambio(self, evento: str, turno: dict, anterior: dict | None) -> None:
+        # Listener para TurnoService.suscribir
+        if evento == "reset":
+            self.limpiar()
+            return
+        self.invalidar(turno["fecha"])
+        if anterior is not None:
+            self.invalidar(anterior["fecha"])
@@ -0,0 +1,136 @@
+# api/sincronizacion.py
+# Soporte para correr varios workers (uvicorn --workers N) sobre la misma base.
+#
+# - CanalCambios: cada proceso publica sus eventos del TurnoService en la tabla
+#   'cambios' y lee los de los demás cuando PRAGMA data_version indica que otra
+#   conexión escribió. Así las caches locales se invalidan en todos los workers.
+# - LiderLock: un solo proceso (el que toma el lock de archivo) corre los jobs
+#   de fondo (archivado, recordatorios).
+import asyncio
+import logging
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin flock, se asume un solo proceso
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+
+class LiderLock:
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    @property
+    def es_lider(self) -> bool:
+        return self._fd is not None or fcntl is None
+
+    def intentar(self) -> bool:
+        """
+        Toma el lock sin bloquear. Lo suelta el sistema operativo si el proceso muere.
+        """
+        if self.es_lider:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def soltar(self) -> None:
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+class CanalCambios:
+    def __init__(self, repo, service, intervalo_seg: float = 0.2, purga_cada_seg: int = 300):
+        # repo: SQLiteRepository (data_version / registrar_cambio / cambios_desde)
+        self.repo = repo
+        self.service = service
+        self.intervalo_seg = intervalo_seg
+        self.purga_cada_seg = purga_cada_seg
+        self.pid = os.getpid()
+        self._replicando = False
+        self._ultimo_id = 0
+        self._data_version = None
+        self._task: asyncio.Task | None = None
+        self.metricas = {"publicados": 0, "recibidos": 0, "sondeos": 0}
+
+        service.suscribir(self.publicar)
+
+    # ---------- Publicación (eventos locales) ----------
+    def publicar(self, evento: str, turno: dict, anterior: dict | None) -> None:
+        # Los eventos que llegan de otro proceso no se vuelven a publicar
+        if self._replicando:
+            return
+        self.repo.registrar_cambio(evento, turno, anterior)
+        self.metricas["publicados"] += 1
+
+    # ---------- Recepción (eventos de otros procesos) ----------
+    def sondear(self) -> int:
+        """
+        Replica en este proceso los cambios nuevos de los demás. Retorna cuántos.
+        """
+        self.metricas["sondeos"] += 1
+        version = self.repo.data_version()
+        if version == self._data_version:
+            return 0
+        self._data_version = version
+
+        recibidos = 0
+        while True:
+            cambios = self.repo.cambios_desde(self._ultimo_id)
+            if not cambios:
+                break
+            for c in cambios:
+                self._ultimo_id = c["id"]
+                if c["pid"] == self.pid:
+                    continue
+                self._replicando = True
+                try:
+                    self.service._emitir(c["evento"], c["turno"], c["anterior"])
+                finally:
+                    self._replicando = False
+                recibidos += 1
+        self.metricas["recibidos"] += recibidos
+        return recibidos
+
+    async def _loop(self, lider: LiderLock | None, al_ser_lider) -> None:
+        ciclos_purga = max(1, int(self.purga_cada_seg / self.intervalo_seg))
+        ciclo = 0
+        while True:
+            try:
+                self.sondear()
+                ciclo += 1
+                if lider is not None and ciclo % ciclos_purga == 0:
+                    # Si el líder murió, otro worker toma el lock y arranca los jobs
+                    if not lider.es_lider and lider.intentar() and al_ser_lider:
+                        al_ser_lider()
+                    if lider.es_lider:
+                        self.repo.purgar_cambios()
+            except Exception:
+                log.exception("sincronizacion: fallo el sondeo")
+            await asyncio.sleep(self.intervalo_seg)
+
+    def iniciar(self, lider: LiderLock | None = None, al_ser_lider=None) -> None:
+        # Lo que ya estaba en la tabla antes de arrancar no aplica a este proceso
+        self._ultimo_id = self.repo.ultimo_cambio_id()
+        self._data_version = self.repo.data_version()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop(lider, al_ser_lider))
+
+    async def detener(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,58 @@
+# api/telegram.py
+# Cliente de Telegram compartido: un solo httpx.AsyncClient (pool de
+# conexiones) y un token bucket global para no pasarnos del límite del bot.
+import asyncio
+import logging
+
+import httpx
+
+from api.rate_limit import TokenBucketLimiter
+from domain.tracing import trazar
+
+log = logging.getLogger(__name__)
+
+
+class TelegramClient:
+    def __init__(self, api_url: str, mensajes_por_seg: float = 25, timeout_seg: float = 10):
+        self.api_url = api_url
+        self.timeout_seg = timeout_seg
+        # Telegram permite ~30 mensajes/s por bot; dejamos margen
+        self._limiter = TokenBucketLimiter(mensajes_por_seg, mensajes_por_seg)
+        self._client: httpx.AsyncClient | None = None
+
+    def _http(self) -> httpx.AsyncClient:
+        # Se crea perezoso para que viva en el event loop del servidor
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout_seg,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+        return self._client
+
+    @trazar("telegram.enviar")
+    async def enviar(self, chat_id: int, text: str) -> bool:
+        """
+        Manda un mensaje. Si el bucket está vacío espera su turno en vez de fallar.
+        Retorna True si Telegram lo aceptó.
+        """
+        while not self._limiter.permitir("global"):
+            await asyncio.sleep(self._limiter.reintentar_en("global"))
+
+        try:
+            resp = await self._http().post(
+                f"{self.api_url}/sendMessage",
+                json={"chat_id": chat_id, "text": text},
+            )
+        except httpx.HTTPError as e:
+            log.warning("telegram: error enviando a %s: %s", chat_id, e)
+            return False
+
+        if resp.status_code != 200:
+            log.warning("telegram: %s respondió %s", chat_id, resp.status_code)
+            return False
+        return True
+
+    async def cerrar(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
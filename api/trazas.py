@@ -0,0 +1,43 @@
+# api/trazas.py
+# Middleware ASGI que abre una traza por request muestreado.
+from domain.tracing import trazador
+
+
+class MiddlewareTrazas:
+    """
+    Muestrea según trazador.muestreo. Con el header "X-Trazar: <ADMIN_TOKEN>"
+    se traza siempre (útil para diagnosticar un request puntual).
+    Los requests no muestreados pasan directo: un random() y nada más.
+    """
+
+    def __init__(self, app, token_forzar: str | None = None):
+        self.app = app
+        self._forzar = token_forzar.encode() if token_forzar else None
+
+    def _forzado(self, scope) -> bool:
+        if self._forzar is None:
+            return False
+        for nombre, valor in scope.get("headers", ()):
+            if nombre == b"x-trazar":
+                return valor == self._forzar
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (trazador.muestrear() or self._forzado(scope)):
+            await self.app(scope, receive, send)
+            return
+
+        traza, token = trazador.iniciar(f"{scope['method']} {scope['path']}")
+
+        async def send_con_status(mensaje):
+            if mensaje["type"] == "http.response.start":
+                traza.attrs["status"] = mensaje["status"]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, send_con_status)
+        except Exception as e:
+            traza.attrs["error"] = type(e).__name__
+            raise
+        finally:
+            trazador.terminar(traza, token)
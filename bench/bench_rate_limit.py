@@ -0,0 +1,25 @@
+# bench/bench_rate_limit.py
+# Costo por request del rate limiter (lo que suma a /reservar y al webhook).
+# Uso: python -m bench.bench_rate_limit
+import random
+import time
+
+from api.rate_limit import RateLimiter
+
+N = 200_000
+
+
+def medir(nombre: str, claves: list[str]) -> None:
+    limiter = RateLimiter({"reservar": "5/60"})
+    t0 = time.perf_counter()
+    for clave in claves:
+        limiter.permitir("reservar", clave)
+    dt = time.perf_counter() - t0
+    print(f"{nombre:<28} {dt / len(claves) * 1e9:8.0f} ns/request  ({limiter.claves_activas()['reservar']} claves)")
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    medir("1 clave caliente", ["chat:1"] * N)
+    medir("1.000 claves", [f"chat:{random.randrange(1_000)}" for _ in range(N)])
+    medir("claves únicas (desalojo)", [f"ip:{i}" for i in range(N)])
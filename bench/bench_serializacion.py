@@ -0,0 +1,71 @@
+# bench/bench_serializacion.py
+# Costo de serializar la respuesta de cada ruta: camino genérico de FastAPI
+# (jsonable_encoder + JSONResponse) contra RespuestaJSON con modelos tipados
+# y contra los bytes cacheados de /disponibilidad.
+# Uso: python -m bench.bench_serializacion
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from api.respuestas import RespuestaJSON
+from domain.models import (
+    Turno,
+    disponibilidadResponde,
+    misTurnosResponde,
+    reservaResponde,
+)
+
+N = 20_000
+
+
+def medir(fn) -> float:
+    t0 = time.perf_counter()
+    for _ in range(N):
+        fn()
+    return (time.perf_counter() - t0) / N * 1e6
+
+
+def fila(i: int) -> dict:
+    return {
+        "id": i, "user_id": "tg_1", "contacto_id": "1", "updated_at": None,
+        "fecha": "2099-01-02", "hora": "10:00", "servicio": "corte",
+        "estado": "reservado", "ticket": f"T-{i:06d}", "archivado": False,
+    }
+
+
+if __name__ == "__main__":
+    libres = [f"{h:02d}:{m:02d}" for h in range(9, 18) for m in (0, 30)] + ["18:00"]
+    disp = {"fecha": "2099-01-02", "libres": libres}
+    disp_bytes = RespuestaJSON(disponibilidadResponde(**disp)).body
+
+    turno = Turno(
+        nombre_cliente="a", telefono_cliente="1", fecha_turno="2099-01-02",
+        hora_turno="10:00", servicio="corte", estado="reservado",
+    )
+    reserva = {"id": 1, "ticket": "T-000001", "turno": turno}
+    mios = {"contacto": "1", "turnos": [fila(i) for i in range(20)]}
+
+    casos = {
+        "/disponibilidad": (
+            lambda: JSONResponse(jsonable_encoder(disp)),
+            lambda: RespuestaJSON(disponibilidadResponde(**disp)),
+            lambda: RespuestaJSON(disp_bytes),
+        ),
+        "/reservar": (
+            lambda: JSONResponse(jsonable_encoder({"status": "reservado", **reserva})),
+            lambda: RespuestaJSON(reservaResponde(**reserva)),
+            None,
+        ),
+        "/turnos/mios (20 items)": (
+            lambda: JSONResponse(jsonable_encoder(mios)),
+            lambda: RespuestaJSON(misTurnosResponde(**mios)),
+            None,
+        ),
+    }
+
+    print(f"{'ruta':<26}{'genérico':>12}{'tipado':>12}{'cacheado':>12}   (µs/respuesta)")
+    for ruta, (generico, tipado, cacheado) in casos.items():
+        cols = [medir(generico), medir(tipado)]
+        cols.append(medir(cacheado) if cacheado else None)
+        print(f"{ruta:<26}" + "".join(f"{c:12.1f}" if c is not None else f"{'-':>12}" for c in cols))
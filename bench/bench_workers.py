@@ -0,0 +1,122 @@
+# bench/bench_workers.py
+# Throughput de la API con 1, 2, 4 y 8 workers de uvicorn sobre la misma base
+# (MULTIPROCESO=1). Mezcla lecturas de /disponibilidad con reservas.
+# Uso: python -m bench.bench_workers [--segundos 10] [--concurrencia 64]
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import httpx
+
+PUERTO = 8765
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HORAS = [f"{h:02d}:{m:02d}" for h in range(9, 18) for m in (0, 30)]
+
+
+def levantar(workers: int, db_path: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "BOT_TOKEN": "bench",
+        "WEBHOOK_SECRET": "bench",
+        "TURNOS_DB_PATH": db_path,
+        "MULTIPROCESO": "1",
+        "RECORDATORIOS": "0",
+        # sin rate limiting: medimos la API, no el limitador
+        "RATE_RESERVAR": "",
+        "RATE_RESERVAR_IP": "",
+        "RATE_WEBHOOK": "",
+    }
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "api.main:app",
+            "--port", str(PUERTO), "--workers", str(workers),
+            "--log-level", "warning", "--no-access-log",
+        ],
+        cwd=RAIZ,
+        env=env,
+    )
+
+
+async def esperar_listo(client: httpx.AsyncClient, timeout_seg: float = 20) -> None:
+    fin = time.monotonic() + timeout_seg
+    while time.monotonic() < fin:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("el servidor no levantó")
+
+
+async def cargar(segundos: float, concurrencia: int, proporcion_reservas: float) -> dict:
+    fechas = [(date.today() + timedelta(days=d)).isoformat() for d in range(2, 400)]
+    contadores = {"ok": 0, "ocupado": 0, "error": 0}
+    fin = 0.0
+
+    async def cliente(client: httpx.AsyncClient, n: int) -> None:
+        rnd = random.Random(n)
+        while time.monotonic() < fin:
+            fecha = rnd.choice(fechas)
+            try:
+                if rnd.random() < proporcion_reservas:
+                    r = await client.post("/reservar", json={
+                        "nombre_cliente": f"bench{n}",
+                        "telefono_cliente": f"{n}",
+                        "fecha_turno": fecha,
+                        "hora_turno": rnd.choice(HORAS),
+                        "servicio": "corte",
+                    })
+                else:
+                    r = await client.get("/disponibilidad", params={"fecha": fecha})
+            except httpx.HTTPError:
+                contadores["error"] += 1
+                continue
+            if r.status_code == 200:
+                contadores["ok"] += 1
+            elif r.status_code == 409:
+                contadores["ocupado"] += 1
+            else:
+                contadores["error"] += 1
+
+    limits = httpx.Limits(max_connections=concurrencia)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PUERTO}", limits=limits) as client:
+        await esperar_listo(client)
+        inicio = time.monotonic()
+        fin = inicio + segundos
+        await asyncio.gather(*(cliente(client, i) for i in range(concurrencia)))
+        contadores["rps"] = round(
+            (contadores["ok"] + contadores["ocupado"]) / (time.monotonic() - inicio), 1
+        )
+    return contadores
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--segundos", type=float, default=10)
+    parser.add_argument("--concurrencia", type=int, default=64)
+    parser.add_argument("--reservas", type=float, default=0.2, help="proporción de POST /reservar")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    print(f"CPUs: {os.cpu_count()}  concurrencia: {args.concurrencia}  reservas: {args.reservas:.0%}")
+    print(f"{'workers':>8}{'req/s':>10}{'ok':>8}{'409':>8}{'error':>8}")
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as tmp:
+            proc = levantar(workers, os.path.join(tmp, "turnos.db"))
+            try:
+                r = asyncio.run(cargar(args.segundos, args.concurrencia, args.reservas))
+            finally:
+                proc.terminate()
+                proc.wait(timeout=20)
+        print(f"{workers:>8}{r['rps']:>10}{r['ok']:>8}{r['ocupado']:>8}{r['error']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# domain/archivo.py
+# Archivado periódico: mueve turnos viejos de la tabla caliente al histórico
+# para que 'turnos' no crezca para siempre.
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+TZ = ZoneInfo("America/Argentina/Buenos_Aires")
+
+log = logging.getLogger(__name__)
+
+
+class ArchivadorTurnos:
+    """
+    Corre fuera del request: un task de asyncio que cada `intervalo_seg`
+    archiva los turnos con más de `dias` de antigüedad, en lotes de `batch_size`.
+    Entre lote y lote cede el event loop para no frenar a los endpoints.
+    """
+
+    def __init__(self, repo, dias: int = 30, batch_size: int = 500, intervalo_seg: int = 3600):
+        # repo: SQLiteRepository (necesita archivar_anteriores / contar_turnos)
+        self.repo = repo
+        self.dias = dias
+        self.batch_size = batch_size
+        self.intervalo_seg = intervalo_seg
+        self._task: asyncio.Task | None = None
+        self.metricas = {
+            "corridas": 0,
+            "movidos_total": 0,
+            "lotes_total": 0,
+            "en_curso": False,
+            "ultima_corrida": None,
+            "ultimo_corte": None,
+            "ultimos_movidos": 0,
+            "ultima_duracion_ms": None,
+            "ultimo_error": None,
+        }
+
+    # ---------- Público ----------
+    def fecha_corte(self) -> str:
+        hoy = datetime.now(TZ).date()
+        return (hoy - timedelta(days=self.dias)).strftime("%Y-%m-%d")
+
+    async def correr_una_vez(self) -> int:
+        """
+        Archiva todo lo anterior al corte, lote por lote. Retorna el total movido.
+        """
+        corte = self.fecha_corte()
+        inicio = datetime.now(TZ)
+        movidos = 0
+
+        self.metricas["en_curso"] = True
+        self.metricas["ultimo_corte"] = corte
+        try:
+            while True:
+                n = self.repo.archivar_anteriores(corte, self.batch_size)
+                if n == 0:
+                    break
+                movidos += n
+                self.metricas["lotes_total"] += 1
+                self.metricas["movidos_total"] += n
+                self.metricas["ultimos_movidos"] = movidos
+                await asyncio.sleep(0)
+            self.metricas["ultimo_error"] = None
+        except Exception as e:
+            self.metricas["ultimo_error"] = f"{type(e).__name__}: {e}"
+            log.exception("archivado: fallo la corrida")
+        finally:
+            duracion = datetime.now(TZ) - inicio
+            self.metricas["en_curso"] = False
+            self.metricas["corridas"] += 1
+            self.metricas["ultima_corrida"] = inicio.isoformat(timespec="seconds")
+            self.metricas["ultima_duracion_ms"] = round(duracion.total_seconds() * 1000, 1)
+
+        return movidos
+
+    def estado(self) -> dict:
+        return {
+            **self.metricas,
+            **self.repo.contar_turnos(),
+            "dias": self.dias,
+            "batch_size": self.batch_size,
+            "intervalo_seg": self.intervalo_seg,
+        }
+
+    # ---------- Loop de fondo ----------
+    async def _loop(self) -> None:
+        while True:
+            await self.correr_una_vez()
+            await asyncio.sleep(self.intervalo_seg)
+
+    def iniciar(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def detener(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,286 @@
+# domain/espera.py
+# Lista de espera: cuando se libera un slot (cancelación o reprogramación)
+# se le ofrece al primero que lo estaba esperando, reteniéndolo un rato.
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from typing import Awaitable, Callable
+from zoneinfo import ZoneInfo
+
+from domain.service import TurnoService
+
+TZ = ZoneInfo("America/Argentina/Buenos_Aires")
+
+log = logging.getLogger(__name__)
+
+
+class IndiceFecha:
+    """
+    Índice de intervalos de un día sobre la malla de slots: cada slot tiene
+    la cola (en orden de llegada) de esperas cuyo rango [desde, hasta] lo cubre.
+    Como la malla es fija y chica, insertar cuesta O(slots del rango) y buscar
+    quién espera un slot es O(1): no depende del tamaño de la lista.
+    """
+
+    def __init__(self, malla: list[str]):
+        self.por_slot: dict[str, deque[int]] = {h: deque() for h in malla}
+        self.ultimo_id = 0
+
+    def agregar(self, espera_id: int, desde: str, hasta: str) -> None:
+        for hora, cola in self.por_slot.items():
+            if desde <= hora <= hasta:
+                cola.append(espera_id)
+        if espera_id > self.ultimo_id:
+            self.ultimo_id = espera_id
+
+    def candidatos(self, hora: str, activos: set[int]):
+        """
+        Esperas activas para el slot, la más vieja primero. Cada id sale de
+        la cola al entregarse; los que ya no están activos se descartan.
+        """
+        cola = self.por_slot.get(hora)
+        while cola:
+            espera_id = cola.popleft()
+            if espera_id in activos:
+                yield espera_id
+
+    def devolver(self, hora: str, espera_id: int) -> None:
+        # Vuelve al frente: conserva su lugar para la próxima vez que se libere
+        self.por_slot[hora].appendleft(espera_id)
+
+
+class ListaEspera:
+    """
+    Fuente de verdad en la tabla 'espera'; en memoria sólo el índice por
+    fecha, que se carga la primera vez que se libera un slot de ese día y
+    después se completa en forma incremental (id > último cargado), así ve
+    también las altas hechas por otros workers.
+
+    La retención del slot se chequea contra la base (retenido_para), así
+    vale para todos los procesos; cada vez que se retiene o se suelta un
+    slot se emite el evento "retencion" del TurnoService, así la cache de
+    /disponibilidad (y la de los demás workers, por el canal) se invalida.
+    El ofrecimiento y el vencimiento de
+    ofertas corren en el proceso líder (el que tiene el loop); la excepción
+    es la baja de una espera ya ofrecida, que vuelve a ofrecer el slot desde
+    el proceso que la atendió (ofrecer_espera es un UPDATE condicional, no
+    hay doble oferta).
+    """
+
+    def __init__(
+        self,
+        repo,
+        service: TurnoService,
+        enviar: Callable[[int, str], Awaitable[bool]],
+        retencion_seg: int = 900,
+        revisar_cada_seg: int = 30,
+        max_por_contacto: int = 5,
+    ):
+        # repo: SQLiteRepository (agregar_espera / ofrecer_espera / ...)
+        self.repo = repo
+        self.service = service
+        self.enviar = enviar
+        self.retencion_seg = retencion_seg
+        self.revisar_cada_seg = revisar_cada_seg
+        self.max_por_contacto = max_por_contacto
+
+        self._indices: dict[str, IndiceFecha] = {}
+        self._activos: set[int] = set()
+        self._chats: dict[int, int] = {}
+        self._task: asyncio.Task | None = None
+        self._ofertas_en_curso: set[asyncio.Task] = set()
+        self.metricas = {
+            "altas": 0, "ofrecidos": 0, "cumplidos": 0, "vencidos": 0, "avisos_fallidos": 0,
+        }
+
+    # ---------- Altas / bajas ----------
+    def registrar(
+        self, contacto: str, chat_id: int | None, fecha: str, desde: str, hasta: str
+    ) -> int:
+        # La oferta se avisa por Telegram: sin chat nunca se podría ofrecer
+        if chat_id is None:
+            raise ValueError("chat_requerido")
+        fecha, desde = self.service._validar_slot(fecha, desde)
+        _, hasta = self.service._validar_slot(fecha, hasta)
+        if desde > hasta:
+            raise ValueError("rango_invalido")
+        hoy = datetime.now(TZ).strftime("%Y-%m-%d")
+        if fecha < hoy:
+            raise ValueError("fecha_pasada")
+        if self.repo.contar_esperas_vigentes(contacto, chat_id, hoy) >= self.max_por_contacto:
+            raise ValueError("demasiadas_esperas")
+
+        espera_id = self.repo.agregar_espera(contacto, chat_id, fecha, desde, hasta)
+        self.metricas["altas"] += 1
+        # Si el índice del día ya está cargado lo completamos ahora mismo
+        if fecha in self._indices:
+            self._sincronizar(fecha)
+        return espera_id
+
+    def baja(self, espera_id: int, contacto: str) -> bool:
+        previa = self.repo.baja_espera(espera_id, contacto)
+        if previa is None:
+            return False
+        self._activos.discard(espera_id)
+        # Tenía el slot retenido: pasa al siguiente de la cola (el vencimiento
+        # de ofertas sólo mira las que siguen en 'ofrecido')
+        if previa["estado"] == "ofrecido":
+            self._avisar_retencion(previa["fecha"], previa["oferta_hora"])
+            self._ofrecer_en_segundo_plano(previa["fecha"], previa["oferta_hora"])
+        return True
+
+    # ---------- Retención (la usa TurnoService.reservar) ----------
+    def retenido_para(self, fecha: str, hora: str) -> tuple[str, ...] | None:
+        """
+        Contactos que pueden tomar el slot retenido: el de la espera y su
+        chat (el bot reserva con str(chat_id)). None si no está retenido.
+        """
+        titular = self.repo.retencion_vigente(fecha, hora)
+        if titular is None:
+            return None
+        if titular["chat_id"] is None:
+            return (titular["contacto_id"],)
+        return (titular["contacto_id"], str(titular["chat_id"]))
+
+    def retenidos(self, fecha: str) -> list[str]:
+        return self.repo.horas_retenidas(fecha)
+
+    def _avisar_retencion(self, fecha: str, hora: str) -> None:
+        self.service._emitir("retencion", {"fecha": fecha, "hora": hora}, None)
+
+    # ---------- Índice ----------
+    def _sincronizar(self, fecha: str) -> IndiceFecha:
+        indice = self._indices.get(fecha)
+        if indice is None:
+            indice = IndiceFecha(self.service._gen_malla(fecha))
+            self._indices[fecha] = indice
+        for e in self.repo.esperas_activas(fecha, indice.ultimo_id):
+            indice.agregar(e["id"], e["desde"], e["hasta"])
+            self._activos.add(e["id"])
+            self._chats[e["id"]] = e["chat_id"]
+        return indice
+
+    def _podar(self) -> None:
+        # Los índices de días pasados ya no sirven
+        hoy = datetime.now(TZ).strftime("%Y-%m-%d")
+        for fecha in [f for f in self._indices if f < hoy]:
+            indice = self._indices.pop(fecha)
+            for cola in indice.por_slot.values():
+                for espera_id in cola:
+                    self._activos.discard(espera_id)
+                    self._chats.pop(espera_id, None)
+
+    # ---------- Ofrecimiento ----------
+    async def ofrecer(self, fecha: str, hora: str) -> int | None:
+        """
+        Ofrece el slot liberado al primero de la cola. Retorna el id de la
+        espera que quedó con la oferta, o None si nadie lo esperaba.
+        """
+        # Fecha y hora: un slot de hoy que ya pasó tampoco se ofrece
+        if f"{fecha} {hora}" < datetime.now(TZ).strftime("%Y-%m-%d %H:%M"):
+            return None
+        if self.repo.existe_turno(fecha, hora):
+            return None
+        # Ya hay una oferta vigente para este slot (p.ej. de otro proceso)
+        if self.repo.retencion_vigente(fecha, hora) is not None:
+            return None
+
+        indice = self._sincronizar(fecha)
+        vence = time.time() + self.retencion_seg
+        for espera_id in indice.candidatos(hora, self._activos):
+            tomado = self.repo.ofrecer_espera(espera_id, fecha, hora, vence)
+            if not tomado and self.repo.estado_espera(espera_id) == "activo":
+                # Sigue activa: falló porque otro proceso retuvo el slot en el
+                # medio. Nadie más lo puede tomar ahora; conserva su lugar
+                indice.devolver(hora, espera_id)
+                return None
+            # Ofrecida, o dada de baja/cumplida en la base: sale del índice
+            self._activos.discard(espera_id)
+            chat_id = self._chats.pop(espera_id, None)
+            if not tomado:
+                continue
+            self._avisar_retencion(fecha, hora)
+            minutos = max(1, self.retencion_seg // 60)
+            enviado = await self.enviar(
+                chat_id,
+                f"🎉 Se liberó un turno: {fecha} {hora}.\n"
+                f"Te lo guardamos {minutos} min. Para tomarlo:\n"
+                f"/reservar {fecha} {hora} <servicio>",
+            )
+            if enviado:
+                self.metricas["ofrecidos"] += 1
+                return espera_id
+            # No se enteró: no tiene sentido retenerle el slot, pasa al siguiente
+            self.repo.descartar_oferta(espera_id)
+            self._avisar_retencion(fecha, hora)
+            self.metricas["avisos_fallidos"] += 1
+        return None
+
+    def on_cambio(self, evento: str, turno: dict, anterior: dict | None) -> None:
+        # Listener para TurnoService.suscribir (sólo actúa en el líder)
+        if self._task is None:
+            return
+        if evento == "reservado":
+            if self.repo.cumplir_oferta(turno["fecha"], turno["hora"], turno.get("contacto_id")):
+                self.metricas["cumplidos"] += 1
+            return
+
+        liberado = None
+        if evento == "cancelado":
+            liberado = turno
+        elif evento == "actualizado" and anterior is not None:
+            if (turno["fecha"], turno["hora"]) != (anterior["fecha"], anterior["hora"]):
+                liberado = anterior
+        if liberado is not None:
+            self._ofrecer_en_segundo_plano(liberado["fecha"], liberado["hora"])
+
+    def _ofrecer_en_segundo_plano(self, fecha: str, hora: str) -> None:
+        # Fuera del request: el que canceló no espera el mensaje de Telegram
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            log.warning("espera: sin event loop, no se ofrece %s %s", fecha, hora)
+            return
+        task = loop.create_task(self.ofrecer(fecha, hora))
+        self._ofertas_en_curso.add(task)
+        task.add_done_callback(self._ofertas_en_curso.discard)
+
+    # ---------- Vencimiento de ofertas ----------
+    async def revisar_vencidas(self) -> int:
+        vencidas = self.repo.vencer_ofertas()
+        self.metricas["vencidos"] += len(vencidas)
+        for v in vencidas:
+            self._avisar_retencion(v["fecha"], v["oferta_hora"])
+            await self.ofrecer(v["fecha"], v["oferta_hora"])
+        return len(vencidas)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.revisar_vencidas()
+                self._podar()
+            except Exception:
+                log.exception("espera: fallo la revisión de ofertas")
+            await asyncio.sleep(self.revisar_cada_seg)
+
+    def iniciar(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def detener(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def estado(self) -> dict:
+        return {
+            **self.metricas,
+            "fechas_indexadas": len(self._indices),
+            "activos_en_indice": len(self._activos),
+        }
@@ -4,6 +4,10 @@
 # domain/interfaces.py
 from abc import ABC, abstractmethod
 
+class SlotOcupadoError(Exception):
+    # La lanza el repo si el slot se ocupó entre el chequeo y la escritura
+    pass
+
 class ITurnoRepository(ABC):
     @abstractmethod
     def get_turnos_ocupados(self, fecha: str) -> list[str]:
@@ -1,5 +1,7 @@
 # En domain/models.py
 # Aquí definimos los modelos de dominio
+from typing import Optional
+
 from pydantic import BaseModel
 
 class Turno(BaseModel):
@@ -19,4 +21,27 @@ class Servicio(BaseModel):
 
 class disponibilidadResponde(BaseModel):
     fecha: str
-    libres: list[str]
\ No newline at end of file
+    libres: list[str]
+
+class turnoResponde(BaseModel):
+    # Forma de las filas del repo (+ ticket legible)
+    id: Optional[int] = None
+    user_id: Optional[str] = None
+    contacto_id: Optional[str] = None
+    updated_at: Optional[str] = None
+    fecha: str
+    hora: str
+    servicio: Optional[str] = None
+    estado: Optional[str] = None
+    ticket: Optional[str] = None
+    archivado: bool = False
+
+class reservaResponde(BaseModel):
+    status: str = "reservado"
+    id: Optional[int] = None
+    ticket: Optional[str] = None
+    turno: Turno
+
+class misTurnosResponde(BaseModel):
+    contacto: str
+    turnos: list[turnoResponde]
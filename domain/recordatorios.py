@@ -0,0 +1,285 @@
+# domain/recordatorios.py
+# Recordatorios de turnos por Telegram: un día antes y dos horas antes.
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+from zoneinfo import ZoneInfo
+
+from domain.service import TurnoService
+
+TZ = ZoneInfo("America/Argentina/Buenos_Aires")
+
+log = logging.getLogger(__name__)
+
+# (tipo, anticipación). Ordenados de mayor a menor: cada recordatorio vale
+# hasta que llega el siguiente (o el turno), así no se mandan dos juntos.
+TIPOS = (
+    ("dia", timedelta(days=1)),
+    ("2h", timedelta(hours=2)),
+)
+
+# {falta} sale del tiempo que de verdad queda (un reintento o un envío
+# atrasado por un reinicio no sale exactamente 2 h antes)
+MENSAJES = {
+    "dia": "⏰ Recordatorio: tenés turno el {fecha} a las {hora}.\n{servicio} - Ticket: {ticket}",
+    "2h": "⏰ En {falta} tenés turno ({hora}).\n{servicio} - Ticket: {ticket}",
+}
+
+
+def texto_falta(segundos: float) -> str:
+    """
+    7200 -> "2 horas", 5400 -> "1 h 30 min", 600 -> "10 min".
+    """
+    horas, minutos = divmod(max(1, round(segundos / 60)), 60)
+    if horas and minutos:
+        return f"{horas} h {minutos} min"
+    if horas:
+        return "1 hora" if horas == 1 else f"{horas} horas"
+    return f"{minutos} min"
+
+
+def chat_id_de(turno: dict) -> int | None:
+    """
+    Sólo los turnos sacados por el bot tienen chat: user_id "tg_<chat_id>"
+    y el chat_id guardado como contacto.
+    """
+    user_id = turno.get("user_id") or ""
+    contacto = (turno.get("contacto_id") or "").strip()
+    if not user_id.startswith("tg_") or not contacto.lstrip("-").isdigit():
+        return None
+    return int(contacto)
+
+
+class ProgramadorRecordatorios:
+    """
+    Min-heap en memoria de (vence_ts, ...) por recordatorio pendiente.
+
+    - Se arma una vez al iniciar con los turnos desde hoy (consulta por índice
+      fecha, hora) y después se mantiene con los eventos del TurnoService.
+    - Cancelaciones y reprogramaciones no tocan el heap: _vigentes guarda la
+      fecha/hora actual de cada turno y las entradas viejas se descartan al salir.
+    - El loop duerme hasta el próximo vencimiento (o hasta que entra uno más
+      temprano); nunca recorre la tabla entera.
+    - Antes de enviar se marca en recordatorios_enviados (INSERT OR IGNORE),
+      así un reinicio u otro proceso no lo duplican.
+    - Un turno nuevo o reprogramado no recibe los recordatorios cuyo momento
+      ya pasó (reservar hoy a las 15 para mañana a las 10 no dispara el "dia").
+      Al cargar, en cambio, se mandan los atrasados que todavía valen: son
+      los que se perdieron mientras el proceso estaba caído.
+    """
+
+    MAX_ESPERA_SEG = 300
+
+    def __init__(
+        self,
+        repo,
+        enviar: Callable[[int, str], Awaitable[bool]],
+        lote: int = 50,
+        reintento_seg: int = 60,
+        reloj=time.time,
+    ):
+        # repo: SQLiteRepository (list_desde / marcar_recordatorio / ...)
+        self.repo = repo
+        self.enviar = enviar
+        self.lote = lote
+        self.reintento_seg = reintento_seg
+        self._reloj = reloj
+
+        self._heap: list[tuple] = []
+        self._vigentes: dict[int, tuple[str, str]] = {}
+        self._despertar = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._cargado = False
+        self.metricas = {
+            "cargados": 0,
+            "enviados": 0,
+            "fallidos": 0,
+            "descartados": 0,
+            "ultimo_lote": 0,
+            "ultima_carga_ms": None,
+        }
+
+    # ---------- Armado del heap ----------
+    def _ahora(self) -> datetime:
+        return datetime.fromtimestamp(self._reloj(), TZ)
+
+    def cargar(self) -> None:
+        inicio = time.perf_counter()
+        ahora = self._ahora()
+        hoy = ahora.strftime("%Y-%m-%d")
+        enviados = self.repo.recordatorios_enviados_desde(hoy)
+
+        self._heap = []
+        self._vigentes = {}
+        for turno in self.repo.list_desde(hoy):
+            self._agregar(turno, enviados, apilar=False, ahora=ahora, atrasados=True)
+        heapq.heapify(self._heap)
+        self._cargado = True
+
+        self.metricas["cargados"] = len(self._heap)
+        self.metricas["ultima_carga_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+        self._despertar.set()
+
+    def _agregar(
+        self,
+        turno: dict,
+        enviados: set = frozenset(),
+        apilar: bool = True,
+        ahora: datetime | None = None,
+        atrasados: bool = False,
+    ) -> None:
+        if turno.get("id") is None or chat_id_de(turno) is None:
+            return
+        try:
+            # fromisoformat es bastante más rápido que strptime al cargar 100k filas
+            comienzo = datetime.fromisoformat(
+                f"{turno['fecha']}T{turno['hora']}"
+            ).replace(tzinfo=TZ)
+        except (KeyError, ValueError):
+            return
+
+        ahora_ts = (ahora or self._ahora()).timestamp()
+        comienzo_ts = comienzo.timestamp()
+        self._vigentes[turno["id"]] = (turno["fecha"], turno["hora"])
+        for i, (tipo, anticipacion) in enumerate(TIPOS):
+            siguiente = TIPOS[i + 1][1] if i + 1 < len(TIPOS) else timedelta(0)
+            vence_ts = comienzo_ts - anticipacion.total_seconds()
+            expira_ts = comienzo_ts - siguiente.total_seconds()
+            if expira_ts <= ahora_ts:
+                continue
+            # Turno nuevo/movido: lo que ya tendría que haber salido no se manda
+            if not atrasados and vence_ts <= ahora_ts:
+                continue
+            if (turno["id"], tipo, turno["fecha"], turno["hora"]) in enviados:
+                continue
+            entrada = (
+                vence_ts,
+                expira_ts,
+                turno["id"],
+                tipo,
+                turno["fecha"],
+                turno["hora"],
+            )
+            if apilar:
+                heapq.heappush(self._heap, entrada)
+            else:
+                self._heap.append(entrada)
+
+    def on_cambio(self, evento: str, turno: dict, anterior: dict | None) -> None:
+        # Listener para TurnoService.suscribir
+        if evento == "reset":
+            if self._cargado:
+                self.cargar()
+            return
+        if evento == "cancelado":
+            self._vigentes.pop(turno["id"], None)
+            self.repo.borrar_recordatorios(turno["id"])
+            return
+        # Sólo el proceso que cargó el heap (el líder) lo mantiene
+        if not self._cargado or evento not in ("reservado", "actualizado"):
+            return
+        if evento == "actualizado" and anterior is not None:
+            if (turno["fecha"], turno["hora"]) == (anterior["fecha"], anterior["hora"]):
+                return
+            self._vigentes.pop(turno["id"], None)
+        self._agregar(turno)
+        self._despertar.set()
+
+    def pendientes(self) -> int:
+        return len(self._heap)
+
+    # ---------- Despacho ----------
+    def _tomar_vencidos(self) -> list[tuple]:
+        ahora = self._reloj()
+        vencidos = []
+        while self._heap and self._heap[0][0] <= ahora and len(vencidos) < self.lote:
+            entrada = heapq.heappop(self._heap)
+            _, expira, turno_id, tipo, fecha, hora = entrada
+            if self._vigentes.get(turno_id) != (fecha, hora) or expira <= ahora:
+                self.metricas["descartados"] += 1
+                continue
+            vencidos.append(entrada)
+        return vencidos
+
+    async def _enviar_uno(self, entrada: tuple) -> None:
+        _, expira, turno_id, tipo, fecha, hora = entrada
+        # Re-chequeo contra la base: otro proceso pudo cancelar/mover el turno
+        turno = self.repo.get_turno_by_rowid(turno_id)
+        if turno is None or (turno["fecha"], turno["hora"]) != (fecha, hora):
+            self.metricas["descartados"] += 1
+            return
+        if not self.repo.marcar_recordatorio(turno_id, tipo, fecha, hora):
+            self.metricas["descartados"] += 1
+            return
+
+        comienzo = datetime.fromisoformat(f"{fecha}T{hora}").replace(tzinfo=TZ)
+        texto = MENSAJES[tipo].format(
+            fecha=fecha,
+            hora=hora,
+            falta=texto_falta(comienzo.timestamp() - self._reloj()),
+            servicio=turno.get("servicio") or "",
+            ticket=TurnoService.encode_ticket(turno_id),
+        )
+        if await self.enviar(chat_id_de(turno), texto):
+            self.metricas["enviados"] += 1
+            return
+
+        # Falló: liberamos la marca y reintentamos más tarde si todavía sirve
+        self.metricas["fallidos"] += 1
+        self.repo.desmarcar_recordatorio(turno_id, tipo, fecha, hora)
+        reintento = self._reloj() + self.reintento_seg
+        if reintento < expira:
+            heapq.heappush(self._heap, (reintento, *entrada[1:]))
+
+    async def procesar_vencidos(self) -> int:
+        """
+        Despacha un lote de recordatorios vencidos. Retorna cuántos tomó.
+        """
+        vencidos = self._tomar_vencidos()
+        if not vencidos:
+            return 0
+        self.metricas["ultimo_lote"] = len(vencidos)
+        resultados = await asyncio.gather(
+            *(self._enviar_uno(e) for e in vencidos), return_exceptions=True
+        )
+        for r in resultados:
+            if isinstance(r, Exception):
+                self.metricas["fallidos"] += 1
+                log.error("recordatorios: fallo al despachar: %r", r)
+        return len(vencidos)
+
+    async def _loop(self) -> None:
+        while True:
+            if await self.procesar_vencidos():
+                continue
+
+            self._despertar.clear()
+            # Tope para no depender de un sleep de días (cambios de reloj, etc.)
+            espera = self.MAX_ESPERA_SEG
+            if self._heap:
+                espera = min(espera, max(0.0, self._heap[0][0] - self._reloj()))
+            try:
+                await asyncio.wait_for(self._despertar.wait(), timeout=espera)
+            except asyncio.TimeoutError:
+                pass
+
+    def iniciar(self) -> None:
+        if self._task is None or self._task.done():
+            self.cargar()
+            self._task = asyncio.create_task(self._loop())
+
+    async def detener(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._cargado = False
+
+    def estado(self) -> dict:
+        return {**self.metricas, "pendientes": self.pendientes()}
@@ -2,16 +2,25 @@
 # # Aquí definimos los servicios de dominio para el sistema de turnos api 
 # # por ejemplo, servicios para la gestión de turnos, pacientes, citas, etc.
 # domain/service.py
+import logging
 from datetime import datetime, time, timedelta
+from typing import Callable, Optional
 from zoneinfo import ZoneInfo
 
 from domain.models import Turno
-from domain.interfaces import ITurnoRepository
+from domain.interfaces import ITurnoRepository, SlotOcupadoError
+from domain.tracing import trazar
 
 TZ = ZoneInfo("America/Argentina/Buenos_Aires")
 
-class SlotOcupadoError(Exception):
-    pass
+log = logging.getLogger(__name__)
+
+# Callback de cambios: (evento, turno, anterior)
+#   evento: "reservado" | "cancelado" | "actualizado" | "reset" | "retencion"
+#   ("reset" llega con turno={}: se borraron todos los turnos;
+#    "retencion" con turno={fecha, hora}: la lista de espera retuvo o soltó el slot)
+#   turno / anterior: dicts con la forma de las filas del repo (id, fecha, hora, ...)
+ListenerCambios = Callable[[str, dict, Optional[dict]], None]
 
 class TurnoService:
     # Config fija para Pasada 2 (en Pasada 4 saldrá de Sheets)
@@ -22,6 +31,26 @@ class TurnoService:
 
     def __init__(self, turno_repository: ITurnoRepository):
         self.repo = turno_repository
+        self._listeners: list[ListenerCambios] = []
+        # Opcional: objeto con retenido_para(fecha, hora) -> contactos | None y
+        # retenidos(fecha) -> horas (la lista de espera retiene el slot
+        # liberado para quien lo esperaba)
+        self.retenciones = None
+
+    # ---------- Eventos de cambio ----------
+    def suscribir(self, listener: ListenerCambios) -> None:
+        """
+        Registra un callback que se llama después de cada escritura exitosa
+        (caches, recordatorios, etc.). Un listener que falla no rompe la escritura.
+        """
+        self._listeners.append(listener)
+
+    def _emitir(self, evento: str, turno: dict, anterior: dict | None = None) -> None:
+        for listener in self._listeners:
+            try:
+                listener(evento, turno, anterior)
+            except Exception:
+                log.exception("listener de cambios falló (%s)", evento)
 
     # ---------- Helpers ----------
     def _parse_hhmm(self, hhmm: str) -> time:
@@ -35,6 +64,35 @@ class TurnoService:
         s = start.hour * 60 + start.minute
         return (m - s) % step_min == 0
 
+    @trazar("service.validar_slot")
+    def _validar_slot(self, fecha: str, hora: str) -> tuple[str, str]:
+        """
+        Valida fecha/hora contra la malla y devuelve ("YYYY-MM-DD", "HH:MM") normalizados.
+        """
+        try:
+            fecha_d = datetime.strptime(fecha, "%Y-%m-%d").date()
+        except Exception:
+            raise ValueError("fecha_invalida")
+
+        hora_t = self._parse_hhmm(hora)
+
+        # Malla y pertenencia
+        open_t = self._parse_hhmm(self.OPEN_TIME)
+        close_t = self._parse_hhmm(self.CLOSE_TIME)
+        if not (open_t <= hora_t <= close_t):
+            raise ValueError("hora_fuera_de_rango")
+        if not self._is_multiple(hora_t, open_t, self.SLOT_MIN):
+            raise ValueError("hora_no_cae_en_slot")
+
+        return fecha_d.strftime("%Y-%m-%d"), f"{hora_t.hour:02d}:{hora_t.minute:02d}"
+
+    def _chequear_retencion(self, fecha: str, hora: str, contacto: str | None) -> None:
+        if self.retenciones is None:
+            return
+        titulares = self.retenciones.retenido_para(fecha, hora)
+        if titulares is not None and contacto not in titulares:
+            raise SlotOcupadoError("retenido")
+
     def _gen_malla(self, fecha: str) -> list[str]:
         ini = self._parse_hhmm(self.OPEN_TIME)
         fin = self._parse_hhmm(self.CLOSE_TIME)
@@ -50,6 +108,7 @@ class TurnoService:
         return slots
 
     # ---------- Público ----------
+    @trazar("service.get_disponibilidad")
     def get_disponibilidad(self, fecha: str, servicio: str | None = None) -> dict:
         # servicio opcional (en Pasada 2 no afecta malla)
         try:
@@ -59,6 +118,9 @@ class TurnoService:
 
         malla = self._gen_malla(fecha)
         ocupados = set(self.repo.get_turnos_ocupados(fecha))
+        # Un slot retenido por la lista de espera sólo lo puede tomar su titular
+        if self.retenciones is not None:
+            ocupados.update(self.retenciones.retenidos(fecha))
         libres = [h for h in malla if h not in ocupados]
 
         # Si es hoy, quitar horas pasadas
@@ -69,34 +131,22 @@ class TurnoService:
 
         return {"fecha": fecha, "libres": libres}
 
-    def reservar(self, data: dict) -> Turno:
+    @trazar("service.reservar")
+    def reservar(self, data: dict) -> dict:
+        """
+        Retorna {"id", "ticket", "turno"}; id/ticket quedan en None si el repo
+        no devuelve rowid (p.ej. el repo en memoria).
+        """
         # Validaciones básicas
         if data.get("servicio", "").strip().lower() not in self.SERVICIOS:
             raise ValueError("servicio_invalido")
 
-        try:
-            fecha = datetime.strptime(data["fecha_turno"], "%Y-%m-%d").date()
-        except Exception:
-            raise ValueError("fecha_invalida")
-
-        try:
-            hora = self._parse_hhmm(data["hora_turno"])
-        except ValueError:
-            raise ValueError("hora_invalida")
-
-        # Malla y pertenencia
-        open_t = self._parse_hhmm(self.OPEN_TIME)
-        close_t = self._parse_hhmm(self.CLOSE_TIME)
-        if not (open_t <= hora <= close_t):
-            raise ValueError("hora_fuera_de_rango")
-        if not self._is_multiple(hora, open_t, self.SLOT_MIN):
-            raise ValueError("hora_no_cae_en_slot")
+        fecha_s, hora_s = self._validar_slot(data["fecha_turno"], data["hora_turno"])
 
         # Duplicado
-        fecha_s = fecha.strftime("%Y-%m-%d")
-        hora_s = f"{hora.hour:02d}:{hora.minute:02d}"
         if self.repo.existe_turno(fecha_s, hora_s):
             raise SlotOcupadoError("ocupado")
+        self._chequear_retencion(fecha_s, hora_s, data.get("telefono_cliente"))
 
         # Guardar
         turno = Turno(**{
@@ -107,8 +157,117 @@ class TurnoService:
             "servicio": data["servicio"].strip().lower(),
             "estado": "reservado",
         })
-        self.repo.save_turno(turno.model_dump())
-        return turno
+        rowid = self.repo.save_turno(turno.model_dump())
+        ticket = self.encode_ticket(rowid) if rowid else None
+
+        self._emitir("reservado", {
+            "id": rowid,
+            "user_id": turno.nombre_cliente,
+            "contacto_id": turno.telefono_cliente,
+            "updated_at": None,
+            "fecha": fecha_s,
+            "hora": hora_s,
+            "servicio": turno.servicio,
+            "estado": turno.estado,
+        })
+        return {"id": rowid, "ticket": ticket, "turno": turno}
+
+    def reset(self, drop: bool = False) -> int:
+        """
+        Borra todos los turnos (desarrollo). El evento "reset" limpia caches y
+        recordatorios; con varios workers viaja a los demás por CanalCambios.
+        """
+        borrados = self.repo.reset(drop=drop)
+        self._emitir("reset", {}, None)
+        return borrados
+
+    # ---------- Por ticket / contacto ----------
+    @trazar("service.listar_por_contacto")
+    def listar_por_contacto(self, contacto: str, historial: bool = False) -> list[dict]:
+        """
+        Turnos de un contacto. Con historial=True incluye los archivados
+        (esos no llevan ticket: ya no se pueden cancelar ni reprogramar).
+        """
+        contacto = (contacto or "").strip()
+        if not contacto:
+            raise ValueError("contacto_invalido")
+
+        items = self.repo.list_by_contact(contacto, incluir_archivo=historial)
+        for item in items:
+            item["ticket"] = None if item.get("archivado") else self.encode_ticket(item["id"])
+        return items
+
+    @trazar("service.get_por_ticket")
+    def get_por_ticket(self, ticket: str) -> dict | None:
+        rowid = self.decode_ticket(ticket)
+        turno = self.repo.get_turno_by_rowid(rowid)
+        if turno is None:
+            return None
+        return {**turno, "ticket": self.encode_ticket(rowid)}
+
+    @trazar("service.delete_por_ticket")
+    def delete_por_ticket(self, ticket: str) -> bool:
+        rowid = self.decode_ticket(ticket)
+        actual = self.repo.get_turno_by_rowid(rowid)
+        if actual is None:
+            raise LookupError("no_encontrado")
+        ok = self.repo.delete_turno_by_rowid(rowid)
+        if ok:
+            self._emitir("cancelado", actual)
+        return ok
+
+    @trazar("service.patch_por_ticket")
+    def patch_por_ticket(self, ticket: str, cambios: dict) -> dict | None:
+        rowid = self.decode_ticket(ticket)
+        actual = self.repo.get_turno_by_rowid(rowid)
+        if actual is None:
+            raise LookupError("no_encontrado")
+
+        cambios = dict(cambios)
+        if "servicio" in cambios:
+            servicio = (cambios["servicio"] or "").strip().lower()
+            if servicio not in self.SERVICIOS:
+                raise ValueError("servicio_invalido")
+            cambios["servicio"] = servicio
+
+        if "fecha" in cambios or "hora" in cambios:
+            fecha_s, hora_s = self._validar_slot(
+                cambios.get("fecha", actual["fecha"]),
+                cambios.get("hora", actual["hora"]),
+            )
+            if self.repo.existe_turno_en(fecha_s, hora_s, excluir_id=rowid):
+                raise RuntimeError("conflicto")
+            try:
+                self._chequear_retencion(fecha_s, hora_s, actual.get("contacto_id"))
+            except SlotOcupadoError:
+                raise RuntimeError("conflicto")
+            cambios["fecha"], cambios["hora"] = fecha_s, hora_s
+
+        try:
+            actualizado = self.repo.update_turno_by_rowid(rowid, cambios)
+        except SlotOcupadoError:
+            # Otro proceso ocupó el slot después del chequeo de arriba
+            raise RuntimeError("conflicto")
+        if actualizado is None:
+            return None
+        self._emitir("actualizado", actualizado, actual)
+        return {**actualizado, "ticket": self.encode_ticket(rowid)}
+
+    # ---------- Tickets ----------
+    # El ticket es el id del turno con formato legible: 42 -> "T-000042".
+    # El id es AUTOINCREMENT, así que un ticket nunca se vuelve a asignar.
+    @staticmethod
+    def encode_ticket(rowid: int) -> str:
+        return f"T-{int(rowid):06d}"
+
+    @staticmethod
+    def decode_ticket(ticket: str) -> int:
+        t = (ticket or "").strip().upper()
+        if t.startswith("T"):
+            t = t[1:].lstrip("-")
+        if not t.isdigit() or int(t) <= 0:
+            raise ValueError("ticket_invalido")
+        return int(t)
 
 
 
@@ -0,0 +1,234 @@
+# domain/tracing.py
+# Trazas livianas en proceso: spans anidados por request (contextvars) y log
+# de consultas lentas. Sin colector externo: las últimas trazas quedan en
+# memoria (GET /admin/trazas) y opcionalmente se agregan a un archivo JSONL.
+#
+# Si el request no fue muestreado no hay traza activa y span()/trazar() sólo
+# hacen un ContextVar.get(): el costo en el camino caliente es casi nulo.
+import functools
+import inspect
+import json
+import logging
+import random
+import re
+import time
+import uuid
+from collections import deque
+from contextvars import ContextVar
+from typing import Any
+
+log = logging.getLogger(__name__)
+
+
+class Traza:
+    __slots__ = ("id", "nombre", "inicio", "spans", "attrs")
+
+    def __init__(self, nombre: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.nombre = nombre
+        self.inicio = time.perf_counter()
+        self.spans: list[dict] = []
+        self.attrs: dict[str, Any] = {}
+
+    def a_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "nombre": self.nombre,
+            "dur_ms": self.attrs.get("dur_ms"),
+            "attrs": {k: v for k, v in self.attrs.items() if k != "dur_ms"},
+            "spans": self.spans,
+        }
+
+
+_traza_actual: ContextVar[Traza | None] = ContextVar("traza_actual", default=None)
+_span_actual: ContextVar[int | None] = ContextVar("span_actual", default=None)
+
+
+class _SpanNulo:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs) -> None:
+        pass
+
+
+_SPAN_NULO = _SpanNulo()
+
+
+class _Span:
+    __slots__ = ("traza", "datos", "_inicio", "_token")
+
+    def __init__(self, traza: Traza, nombre: str, attrs: dict):
+        self.traza = traza
+        self.datos = {"nombre": nombre, "padre": _span_actual.get(), **attrs}
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        self.datos["inicio_ms"] = round((self._inicio - self.traza.inicio) * 1000, 3)
+        self.traza.spans.append(self.datos)
+        self._token = _span_actual.set(len(self.traza.spans) - 1)
+        return self
+
+    def __exit__(self, tipo, exc, tb):
+        self.datos["dur_ms"] = round((time.perf_counter() - self._inicio) * 1000, 3)
+        if tipo is not None:
+            self.datos["error"] = tipo.__name__
+        _span_actual.reset(self._token)
+        return False
+
+    def set(self, **attrs) -> None:
+        self.datos.update(attrs)
+
+
+def span(nombre: str, **attrs):
+    """
+    with span("repo.save_turno"): ...  — no-op si no hay traza activa.
+    """
+    traza = _traza_actual.get()
+    if traza is None:
+        return _SPAN_NULO
+    return _Span(traza, nombre, attrs)
+
+
+def trazar(nombre: str):
+    """
+    Decorador: envuelve la función (sync o async) en un span.
+    """
+    def decorador(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def envoltura_async(*args, **kwargs):
+                traza = _traza_actual.get()
+                if traza is None:
+                    return await fn(*args, **kwargs)
+                with _Span(traza, nombre, {}):
+                    return await fn(*args, **kwargs)
+            return envoltura_async
+
+        @functools.wraps(fn)
+        def envoltura(*args, **kwargs):
+            traza = _traza_actual.get()
+            if traza is None:
+                return fn(*args, **kwargs)
+            with _Span(traza, nombre, {}):
+                return fn(*args, **kwargs)
+        return envoltura
+
+    return decorador
+
+
+_ESPACIOS = re.compile(r"\s+")
+
+
+def _forma_params(params: Any) -> Any:
+    # Sólo tipos, nunca valores (hay teléfonos y nombres en los parámetros)
+    if isinstance(params, dict):
+        return {k: type(v).__name__ for k, v in params.items()}
+    if isinstance(params, (list, tuple)):
+        if len(params) > 8:
+            return f"{len(params)} x {type(params[0]).__name__}"
+        return [type(v).__name__ for v in params]
+    return type(params).__name__
+
+
+class Trazador:
+    """
+    Configuración y destino de trazas y consultas lentas (un singleton por proceso).
+    """
+
+    def __init__(self):
+        self.muestreo = 0.0
+        self.lentas_ms = 50.0
+        self.lentas_muestreo = 1.0
+        self.archivo: str | None = None
+        self.trazas: deque[dict] = deque(maxlen=200)
+        self.consultas_lentas: deque[dict] = deque(maxlen=200)
+
+    def configurar(
+        self,
+        muestreo: float | None = None,
+        lentas_ms: float | None = None,
+        lentas_muestreo: float | None = None,
+        archivo: str | None = None,
+        max_items: int | None = None,
+    ) -> None:
+        if muestreo is not None:
+            self.muestreo = muestreo
+        if lentas_ms is not None:
+            self.lentas_ms = lentas_ms
+        if lentas_muestreo is not None:
+            self.lentas_muestreo = lentas_muestreo
+        if archivo is not None:
+            self.archivo = archivo or None
+        if max_items is not None:
+            self.trazas = deque(self.trazas, maxlen=max_items)
+            self.consultas_lentas = deque(self.consultas_lentas, maxlen=max_items)
+
+    # ---------- Trazas ----------
+    def muestrear(self) -> bool:
+        return self.muestreo > 0 and random.random() < self.muestreo
+
+    def iniciar(self, nombre: str) -> tuple[Traza, Any]:
+        traza = Traza(nombre)
+        return traza, _traza_actual.set(traza)
+
+    def terminar(self, traza: Traza, token: Any) -> None:
+        _traza_actual.reset(token)
+        traza.attrs["dur_ms"] = round((time.perf_counter() - traza.inicio) * 1000, 3)
+        datos = traza.a_dict()
+        self.trazas.append(datos)
+        self._exportar({"tipo": "traza", **datos})
+
+    # ---------- Consultas ----------
+    def registrar_query(self, sql: str, params: Any, dur_s: float) -> None:
+        """
+        Llamado por el repo después de cada consulta.
+        """
+        traza = _traza_actual.get()
+        dur_ms = dur_s * 1000
+        if traza is not None:
+            traza.spans.append({
+                "nombre": "sql",
+                "padre": _span_actual.get(),
+                "inicio_ms": round((time.perf_counter() - traza.inicio) * 1000 - dur_ms, 3),
+                "dur_ms": round(dur_ms, 3),
+                "sql": _ESPACIOS.sub(" ", sql).strip()[:200],
+            })
+        if dur_ms < self.lentas_ms or random.random() >= self.lentas_muestreo:
+            return
+        datos = {
+            "sql": _ESPACIOS.sub(" ", sql).strip(),
+            "params": _forma_params(params),
+            "dur_ms": round(dur_ms, 3),
+            "traza": traza.id if traza is not None else None,
+            "ts": time.time(),
+        }
+        self.consultas_lentas.append(datos)
+        log.warning("consulta lenta (%.1f ms): %s", dur_ms, datos["sql"][:200])
+        self._exportar({"tipo": "consulta_lenta", **datos})
+
+    # ---------- Exportación ----------
+    def _exportar(self, datos: dict) -> None:
+        if not self.archivo:
+            return
+        try:
+            with open(self.archivo, "a", encoding="utf-8") as f:
+                f.write(json.dumps(datos, ensure_ascii=False) + "\n")
+        except OSError as e:
+            log.warning("trazas: no se pudo escribir %s: %s", self.archivo, e)
+
+    def volcar(self, limite: int = 50) -> dict:
+        return {
+            "muestreo": self.muestreo,
+            "lentas_ms": self.lentas_ms,
+            "trazas": list(self.trazas)[-limite:],
+            "consultas_lentas": list(self.consultas_lentas)[-limite:],
+        }
+
+
+trazador = Trazador()
@@ -1,9 +1,13 @@
 # repo/sqlite_repo.py
 # Repositorio SQLite para el sistema de turnos
 
+import json
+import os
 import sqlite3
+import time
 from typing import Any, Dict, List, Optional
-from domain.interfaces import ITurnoRepository
+from domain.interfaces import ITurnoRepository, SlotOcupadoError
+from domain.tracing import trazador, trazar
 
 
 _ALLOWED_UPDATE_FIELDS = {
@@ -17,6 +21,73 @@ _ALLOWED_UPDATE_FIELDS = {
 }
 
 
+# id AUTOINCREMENT: SQLite nunca reusa un id, ni después de borrar o
+# archivar el turno. El ticket sale de acá, así uno viejo no puede
+# apuntar al turno de otra persona.
+_COLUMNAS_TURNOS = """
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id     TEXT,
+    contacto_id TEXT,
+    updated_at  TEXT,
+    fecha       TEXT,
+    hora        TEXT,
+    servicio    TEXT,
+    estado      TEXT,
+    -- Para evitar doble reserva por mismo contacto en mismo slot
+    UNIQUE(contacto_id, fecha, hora)
+"""
+
+
+# Una espera es del contacto con que se anotó o de su chat de Telegram
+# (el bot usa str(chat_id) como contacto). Parámetros: (contacto, contacto).
+_TITULAR_ESPERA = "(contacto_id = ? OR CAST(chat_id AS TEXT) = ?)"
+
+
+class CursorTrazado(sqlite3.Cursor):
+    """
+    Mide cada execute(): suma un span "sql" si el request está trazado y
+    alimenta el log de consultas lentas.
+    """
+
+    def execute(self, sql, parameters=()):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            trazador.registrar_query(sql, parameters, time.perf_counter() - inicio)
+
+
+class ConexionTrazada(sqlite3.Connection):
+    def cursor(self, factory=CursorTrazado):
+        return super().cursor(factory)
+
+    def commit(self):
+        # El commit es donde se paga el fsync: se mide aparte de la consulta
+        inicio = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            trazador.registrar_query("COMMIT", (), time.perf_counter() - inicio)
+
+
+def conectar(path: str = "turnos.db", busy_timeout_ms: int = 5000) -> sqlite3.Connection:
+    """
+    Abre la base para un proceso. Con WAL los lectores no bloquean al escritor,
+    así varios workers de uvicorn pueden compartir el mismo archivo; busy_timeout
+    hace que un writer espere el lock en vez de fallar con "database is locked".
+    """
+    conn = sqlite3.connect(
+        path,
+        check_same_thread=False,
+        timeout=busy_timeout_ms / 1000,
+        factory=ConexionTrazada,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+    return conn
+
+
 class SQLiteRepository(ITurnoRepository):
     def __init__(self, conn: sqlite3.Connection):
         self.conn = conn
@@ -30,9 +101,18 @@ class SQLiteRepository(ITurnoRepository):
         Crea la tabla si no existe. Mantener el UNIQUE consistente acá y en reset(drop=True).
         """
         cur = self.conn.cursor()
+        cur.execute(f"CREATE TABLE IF NOT EXISTS turnos({_COLUMNAS_TURNOS})")
+        self._migrar_id_turnos(cur)
+        # Índice para las consultas por día/slot y para el corte del archivado
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_turnos_fecha_hora ON turnos(fecha, hora)"
+        )
+        # Histórico: turnos pasados que se movieron fuera de la tabla caliente.
+        # id_original guarda el id que tenía en 'turnos' (su ticket).
         cur.execute(
             """
-            CREATE TABLE IF NOT EXISTS turnos(
+            CREATE TABLE IF NOT EXISTS turnos_archivo(
+                id_original INTEGER,
                 user_id     TEXT,
                 contacto_id TEXT,
                 updated_at  TEXT,
@@ -40,13 +120,106 @@ class SQLiteRepository(ITurnoRepository):
                 hora        TEXT,
                 servicio    TEXT,
                 estado      TEXT,
-                -- Para evitar doble reserva por mismo contacto en mismo slot
-                UNIQUE(contacto_id, fecha, hora)
+                archivado_at TEXT
+            )
+            """
+        )
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_archivo_contacto ON turnos_archivo(contacto_id, fecha, hora)"
+        )
+        # Recordatorios ya enviados (o tomados para enviar). Incluye fecha/hora:
+        # si el turno se reprograma, el recordatorio del nuevo horario es otro.
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS recordatorios_enviados(
+                turno_id   INTEGER,
+                tipo       TEXT,
+                fecha      TEXT,
+                hora       TEXT,
+                enviado_at TEXT,
+                PRIMARY KEY(turno_id, tipo, fecha, hora)
             )
             """
         )
+        # Lista de espera: interés en un rango horario de un día.
+        # estado: activo -> ofrecido (slot retenido hasta vence_ts) -> cumplido/vencido; o baja
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS espera(
+                id          INTEGER PRIMARY KEY AUTOINCREMENT,
+                contacto_id TEXT,
+                chat_id     INTEGER,
+                fecha       TEXT,
+                desde       TEXT,
+                hasta       TEXT,
+                estado      TEXT DEFAULT 'activo',
+                oferta_hora TEXT,
+                vence_ts    REAL,
+                creado_at   TEXT DEFAULT (datetime('now'))
+            )
+            """
+        )
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_espera_fecha ON espera(fecha, estado, id)"
+        )
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_espera_oferta ON espera(estado, fecha, oferta_hora, vence_ts)"
+        )
+        # Canal de cambios entre procesos (ver api/sincronizacion.py)
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cambios(
+                id         INTEGER PRIMARY KEY AUTOINCREMENT,
+                pid        INTEGER,
+                evento     TEXT,
+                turno      TEXT,
+                anterior   TEXT,
+                creado_at  TEXT DEFAULT (datetime('now'))
+            )
+            """
+        )
+        self._asegurar_secuencia(cur)
         self.conn.commit()
 
+    def _migrar_id_turnos(self, cur: sqlite3.Cursor) -> None:
+        """
+        Bases creadas antes del id AUTOINCREMENT: se reconstruye la tabla
+        conservando los rowids, así los tickets ya entregados siguen valiendo.
+        """
+        cur.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'turnos'")
+        if "AUTOINCREMENT" in cur.fetchone()[0].upper():
+            return
+        cur.execute("DROP TABLE IF EXISTS turnos_nueva")
+        cur.execute(f"CREATE TABLE turnos_nueva({_COLUMNAS_TURNOS})")
+        cur.execute(
+            """
+            INSERT INTO turnos_nueva
+                (id, user_id, contacto_id, updated_at, fecha, hora, servicio, estado)
+            SELECT
+                rowid, user_id, contacto_id, updated_at, fecha, hora, servicio, estado
+            FROM turnos
+            """
+        )
+        cur.execute("DROP TABLE turnos")
+        cur.execute("ALTER TABLE turnos_nueva RENAME TO turnos")
+
+    def _asegurar_secuencia(self, cur: sqlite3.Cursor, minimo: int = 0) -> None:
+        """
+        La secuencia del AUTOINCREMENT no baja de los ids ya archivados ni
+        de 'minimo' (la que tenía la tabla antes de un reset(drop=True)).
+        """
+        cur.execute("SELECT COALESCE(MAX(id_original), 0) FROM turnos_archivo")
+        maximo = max(cur.fetchone()[0], minimo)
+        cur.execute("SELECT seq FROM sqlite_sequence WHERE name = 'turnos'")
+        fila = cur.fetchone()
+        if fila is None:
+            if maximo:
+                cur.execute(
+                    "INSERT INTO sqlite_sequence (name, seq) VALUES ('turnos', ?)", (maximo,)
+                )
+        elif fila[0] < maximo:
+            cur.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = 'turnos'", (maximo,))
+
     # ---------------------------
     # Lecturas auxiliares
     # ---------------------------
@@ -69,6 +242,7 @@ class SQLiteRepository(ITurnoRepository):
     # ---------------------------
     # Consultas de disponibilidad
     # ---------------------------
+    @trazar("repo.get_turnos_ocupados")
     def get_turnos_ocupados(self, fecha: str) -> List[str]:
         cur = self.conn.cursor()
         cur.execute(
@@ -78,6 +252,7 @@ class SQLiteRepository(ITurnoRepository):
         resultados = cur.fetchall()
         return [fila[0] for fila in resultados]
 
+    @trazar("repo.existe_turno")
     def existe_turno(self, fecha: str, hora: str) -> bool:
         cur = self.conn.cursor()
         cur.execute(
@@ -86,6 +261,7 @@ class SQLiteRepository(ITurnoRepository):
         )
         return cur.fetchone() is not None
 
+    @trazar("repo.existe_turno_en")
     def existe_turno_en(
         self, fecha: str, hora: str, excluir_id: Optional[int] = None
     ) -> bool:
@@ -108,18 +284,24 @@ class SQLiteRepository(ITurnoRepository):
     # ---------------------------
     # CRUD
     # ---------------------------
+    @trazar("repo.save_turno")
     def save_turno(self, turno_data: Dict[str, Any]) -> int:
         """
         Inserta un turno y retorna el rowid asignado (para que el service genere el 'ticket').
         Espera keys: nombre_cliente, telefono_cliente, fecha_turno, hora_turno, servicio, estado, updated_at(opc).
         """
         cur = self.conn.cursor()
+        # El chequeo de slot libre va dentro del mismo INSERT: con varios
+        # procesos, existe_turno() + INSERT por separado deja una carrera.
         cur.execute(
             """
             INSERT INTO turnos
                 (user_id, contacto_id, updated_at, fecha, hora, servicio, estado)
-            VALUES
-                (?,       ?,           ?,          ?,     ?,    ?,        ?)
+            SELECT
+                ?,       ?,           ?,          ?,     ?,    ?,        ?
+            WHERE NOT EXISTS (
+                SELECT 1 FROM turnos WHERE fecha = ? AND hora = ?
+            )
             """,
             (
                 turno_data.get("nombre_cliente"),
@@ -129,11 +311,16 @@ class SQLiteRepository(ITurnoRepository):
                 turno_data["hora_turno"],
                 (turno_data["servicio"] or "").strip().lower(),
                 turno_data["estado"],
+                turno_data["fecha_turno"],
+                turno_data["hora_turno"],
             ),
         )
         self.conn.commit()
+        if (cur.rowcount or 0) != 1:
+            raise SlotOcupadoError("ocupado")
         return int(cur.lastrowid)
 
+    @trazar("repo.get_turno_by_rowid")
     def get_turno_by_rowid(self, rowid: int) -> Optional[Dict[str, Any]]:
         """
         Devuelve el turno (incluye id=rowid) o None si no existe.
@@ -153,6 +340,7 @@ class SQLiteRepository(ITurnoRepository):
         row = cur.fetchone()
         return self._row_to_dict(row) if row else None
 
+    @trazar("repo.delete_turno_by_rowid")
     def delete_turno_by_rowid(self, rowid: int) -> bool:
         """
         Borra una fila por rowid. Retorna True si afectó 1 fila.
@@ -162,13 +350,15 @@ class SQLiteRepository(ITurnoRepository):
         self.conn.commit()
         return (cur.rowcount or 0) == 1
 
+    @trazar("repo.update_turno_by_rowid")
     def update_turno_by_rowid(
         self, rowid: int, cambios: Dict[str, Any]
     ) -> Optional[Dict[str, Any]]:
         """
         Actualiza campos permitidos y retorna el turno actualizado.
         Si no hay campos válidos en 'cambios', no hace nada y devuelve el actual.
-        Retorna None si el rowid no existe.
+        Retorna None si el rowid no existe. Si cambia fecha/hora y el slot
+        destino ya tiene otro turno, lanza SlotOcupadoError.
         """
         if not cambios:
             return self.get_turno_by_rowid(rowid)
@@ -191,18 +381,84 @@ class SQLiteRepository(ITurnoRepository):
         valores = list(to_set.values())
         valores.append(rowid)  # WHERE rowid = ?
 
+        # Reprogramación: igual que en save_turno, el slot destino se chequea
+        # dentro del UPDATE (el UNIQUE sólo frena duplicados del mismo contacto)
+        mueve = "fecha" in to_set or "hora" in to_set
+        guarda = ""
+        if mueve:
+            guarda = """
+                AND NOT EXISTS (
+                    SELECT 1 FROM turnos AS otro
+                    WHERE otro.fecha = COALESCE(?, turnos.fecha)
+                      AND otro.hora = COALESCE(?, turnos.hora)
+                      AND otro.rowid != turnos.rowid
+                )
+            """
+            valores += [to_set.get("fecha"), to_set.get("hora")]
+
         cur = self.conn.cursor()
-        cur.execute(f"UPDATE turnos SET {campos} WHERE rowid = ?", valores)
+        cur.execute(f"UPDATE turnos SET {campos} WHERE rowid = ?{guarda}", valores)
         self.conn.commit()
 
         if (cur.rowcount or 0) != 1:
+            if mueve and self.get_turno_by_rowid(rowid) is not None:
+                raise SlotOcupadoError("ocupado")
             return None
 
         return self.get_turno_by_rowid(rowid)
 
-    def list_by_contact(self, contacto_id: str) -> List[Dict[str, Any]]:
+    @trazar("repo.list_by_contact")
+    def list_by_contact(
+        self, contacto_id: str, incluir_archivo: bool = False
+    ) -> List[Dict[str, Any]]:
         """
         Lista turnos por contacto (p.ej., teléfono). Útil para 'mis turnos' en Telegram.
+        Con incluir_archivo=True suma el histórico (UNION con turnos_archivo);
+        cada item trae "archivado" para distinguirlos.
+        """
+        self.conn.row_factory = sqlite3.Row
+        cur = self.conn.cursor()
+        if not incluir_archivo:
+            cur.execute(
+                """
+                SELECT
+                    rowid AS id,
+                    user_id, contacto_id, updated_at, fecha, hora, servicio, estado,
+                    0 AS archivado
+                FROM turnos
+                WHERE contacto_id = ?
+                ORDER BY fecha, hora
+                """,
+                (contacto_id,),
+            )
+        else:
+            cur.execute(
+                """
+                SELECT
+                    rowid AS id,
+                    user_id, contacto_id, updated_at, fecha, hora, servicio, estado,
+                    0 AS archivado
+                FROM turnos
+                WHERE contacto_id = ?
+                UNION ALL
+                SELECT
+                    id_original AS id,
+                    user_id, contacto_id, updated_at, fecha, hora, servicio, estado,
+                    1 AS archivado
+                FROM turnos_archivo
+                WHERE contacto_id = ?
+                ORDER BY fecha, hora
+                """,
+                (contacto_id, contacto_id),
+            )
+        rows = cur.fetchall()
+        return [
+            {**self._row_to_dict(r), "archivado": bool(r["archivado"])} for r in rows
+        ]
+
+    def list_desde(self, fecha: str) -> List[Dict[str, Any]]:
+        """
+        Turnos con fecha >= 'fecha', ordenados (usa idx_turnos_fecha_hora).
         """
         self.conn.row_factory = sqlite3.Row
         cur = self.conn.cursor()
@@ -212,13 +468,361 @@ class SQLiteRepository(ITurnoRepository):
                 rowid AS id,
                 user_id, contacto_id, updated_at, fecha, hora, servicio, estado
             FROM turnos
-            WHERE contacto_id = ?
+            WHERE fecha >= ?
             ORDER BY fecha, hora
             """,
-            (contacto_id,),
+            (fecha,),
         )
-        rows = cur.fetchall()
-        return [self._row_to_dict(r) for r in rows]
+        return [self._row_to_dict(r) for r in cur.fetchall()]
+
+    # ---------------------------
+    # Recordatorios
+    # ---------------------------
+    def recordatorios_enviados_desde(self, fecha: str) -> set:
+        """
+        Claves (turno_id, tipo, fecha, hora) ya enviadas para turnos desde 'fecha'.
+        """
+        cur = self.conn.cursor()
+        cur.execute(
+            "SELECT turno_id, tipo, fecha, hora FROM recordatorios_enviados WHERE fecha >= ?",
+            (fecha,),
+        )
+        return {tuple(fila) for fila in cur.fetchall()}
+
+    def marcar_recordatorio(self, turno_id: int, tipo: str, fecha: str, hora: str) -> bool:
+        """
+        Toma el recordatorio para enviarlo. Retorna False si ya estaba marcado
+        (otro proceso o una corrida anterior ya lo mandó).
+        """
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            INSERT OR IGNORE INTO recordatorios_enviados
+                (turno_id, tipo, fecha, hora, enviado_at)
+            VALUES (?, ?, ?, ?, datetime('now'))
+            """,
+            (turno_id, tipo, fecha, hora),
+        )
+        self.conn.commit()
+        return (cur.rowcount or 0) == 1
+
+    def desmarcar_recordatorio(self, turno_id: int, tipo: str, fecha: str, hora: str) -> None:
+        cur = self.conn.cursor()
+        cur.execute(
+            "DELETE FROM recordatorios_enviados WHERE turno_id = ? AND tipo = ? AND fecha = ? AND hora = ?",
+            (turno_id, tipo, fecha, hora),
+        )
+        self.conn.commit()
+
+    def borrar_recordatorios(self, turno_id: int) -> None:
+        """
+        Al cancelar un turno sus marcas ya no sirven (los ids no se reusan).
+        """
+        cur = self.conn.cursor()
+        cur.execute("DELETE FROM recordatorios_enviados WHERE turno_id = ?", (turno_id,))
+        self.conn.commit()
+
+    # ---------------------------
+    # Lista de espera
+    # ---------------------------
+    def agregar_espera(
+        self, contacto_id: str, chat_id: Optional[int], fecha: str, desde: str, hasta: str
+    ) -> int:
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO espera (contacto_id, chat_id, fecha, desde, hasta)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (contacto_id, chat_id, fecha, desde, hasta),
+        )
+        self.conn.commit()
+        return int(cur.lastrowid)
+
+    def contar_esperas_vigentes(self, contacto_id: str, chat_id: Optional[int], desde_fecha: str) -> int:
+        # Activas u ofrecidas de hoy en adelante, con ese contacto o ese chat
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            SELECT COUNT(*) FROM espera
+            WHERE (contacto_id = ? OR chat_id = ?)
+              AND estado IN ('activo', 'ofrecido') AND fecha >= ?
+            """,
+            (contacto_id, chat_id, desde_fecha),
+        )
+        return cur.fetchone()[0]
+
+    def esperas_activas(self, fecha: str, desde_id: int = 0) -> List[Dict[str, Any]]:
+        """
+        Esperas activas de un día con id > desde_id (para cargar el índice
+        en forma incremental), en orden de llegada. Las que no tienen chat
+        quedan afuera: no hay cómo avisarles la oferta.
+        """
+        self.conn.row_factory = sqlite3.Row
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            SELECT id, contacto_id, chat_id, fecha, desde, hasta
+            FROM espera
+            WHERE fecha = ? AND estado = 'activo' AND id > ? AND chat_id IS NOT NULL
+            ORDER BY id
+            """,
+            (fecha, desde_id),
+        )
+        return [dict(r) for r in cur.fetchall()]
+
+    def ofrecer_espera(self, espera_id: int, fecha: str, hora: str, vence_ts: float) -> bool:
+        """
+        Pasa la espera a 'ofrecido' reteniendo el slot. Es un solo UPDATE
+        condicional: falla si la espera ya no está activa o si el slot ya
+        tiene una oferta vigente (p.ej. la hizo otro proceso).
+        """
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            UPDATE espera SET estado = 'ofrecido', oferta_hora = ?, vence_ts = ?
+            WHERE id = ? AND estado = 'activo'
+              AND NOT EXISTS (
+                SELECT 1 FROM espera
+                WHERE estado = 'ofrecido' AND fecha = ? AND oferta_hora = ? AND vence_ts > ?
+              )
+            """,
+            (hora, vence_ts, espera_id, fecha, hora, time.time()),
+        )
+        self.conn.commit()
+        return (cur.rowcount or 0) == 1
+
+    def estado_espera(self, espera_id: int) -> Optional[str]:
+        cur = self.conn.cursor()
+        cur.execute("SELECT estado FROM espera WHERE id = ?", (espera_id,))
+        fila = cur.fetchone()
+        return fila[0] if fila else None
+
+    def descartar_oferta(self, espera_id: int) -> bool:
+        """
+        Libera el slot de una oferta que no se pudo avisar (la espera pasa a
+        'vencido', como si hubiera dejado correr el plazo).
+        """
+        cur = self.conn.cursor()
+        cur.execute(
+            "UPDATE espera SET estado = 'vencido' WHERE id = ? AND estado = 'ofrecido'",
+            (espera_id,),
+        )
+        self.conn.commit()
+        return (cur.rowcount or 0) == 1
+
+    def retencion_vigente(self, fecha: str, hora: str) -> Optional[Dict[str, Any]]:
+        """
+        Titular (contacto_id, chat_id) de la oferta vigente de la lista de
+        espera que retiene el slot, o None.
+        """
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            SELECT contacto_id, chat_id FROM espera
+            WHERE estado = 'ofrecido' AND fecha = ? AND oferta_hora = ? AND vence_ts > ?
+            LIMIT 1
+            """,
+            (fecha, hora, time.time()),
+        )
+        fila = cur.fetchone()
+        return {"contacto_id": fila[0], "chat_id": fila[1]} if fila else None
+
+    def horas_retenidas(self, fecha: str) -> List[str]:
+        # Slots del día con una oferta vigente (no se muestran como libres)
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            SELECT DISTINCT oferta_hora FROM espera
+            WHERE estado = 'ofrecido' AND fecha = ? AND vence_ts > ?
+            """,
+            (fecha, time.time()),
+        )
+        return [fila[0] for fila in cur.fetchall()]
+
+    def cumplir_oferta(self, fecha: str, hora: str, contacto_id: str) -> bool:
+        # El bot reserva con el chat_id como contacto: vale cualquiera de los dos
+        cur = self.conn.cursor()
+        cur.execute(
+            f"""
+            UPDATE espera SET estado = 'cumplido'
+            WHERE estado = 'ofrecido' AND fecha = ? AND oferta_hora = ? AND {_TITULAR_ESPERA}
+            """,
+            (fecha, hora, contacto_id, contacto_id),
+        )
+        self.conn.commit()
+        return (cur.rowcount or 0) > 0
+
+    def vencer_ofertas(self) -> List[Dict[str, Any]]:
+        """
+        Marca 'vencido' las ofertas cuyo plazo pasó y las retorna (fecha, oferta_hora)
+        para ofrecer el slot al siguiente.
+        """
+        ahora = time.time()
+        self.conn.row_factory = sqlite3.Row
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            SELECT id, fecha, oferta_hora FROM espera
+            WHERE estado = 'ofrecido' AND vence_ts <= ?
+            """,
+            (ahora,),
+        )
+        vencidas = [dict(r) for r in cur.fetchall()]
+        if vencidas:
+            marcas = ", ".join("?" for _ in vencidas)
+            cur.execute(
+                f"UPDATE espera SET estado = 'vencido' WHERE estado = 'ofrecido' AND id IN ({marcas})",
+                [v["id"] for v in vencidas],
+            )
+            self.conn.commit()
+        return vencidas
+
+    def baja_espera(self, espera_id: int, contacto_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Da de baja una espera activa u ofrecida del contacto (o de su chat).
+        Retorna cómo estaba (estado, fecha, oferta_hora) para poder ofrecer
+        el slot que tenía retenido, o None si no había nada que dar de baja.
+        """
+        self.conn.row_factory = sqlite3.Row
+        cur = self.conn.cursor()
+        cur.execute(
+            f"""
+            SELECT estado, fecha, oferta_hora FROM espera
+            WHERE id = ? AND {_TITULAR_ESPERA} AND estado IN ('activo', 'ofrecido')
+            """,
+            (espera_id, contacto_id, contacto_id),
+        )
+        fila = cur.fetchone()
+        if fila is None:
+            return None
+        # Condicionado al estado leído: si el líder la venció en el medio, no se pisa
+        cur.execute(
+            "UPDATE espera SET estado = 'baja' WHERE id = ? AND estado = ?",
+            (espera_id, fila["estado"]),
+        )
+        self.conn.commit()
+        return dict(fila) if (cur.rowcount or 0) == 1 else None
+
+    # ---------------------------
+    # Cambios entre procesos
+    # ---------------------------
+    def data_version(self) -> int:
+        """
+        PRAGMA data_version cambia cuando OTRA conexión hace commit: leerlo es
+        casi gratis y evita consultar 'cambios' si nadie escribió.
+        """
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def registrar_cambio(
+        self, evento: str, turno: Dict[str, Any], anterior: Optional[Dict[str, Any]]
+    ) -> None:
+        cur = self.conn.cursor()
+        cur.execute(
+            "INSERT INTO cambios (pid, evento, turno, anterior) VALUES (?, ?, ?, ?)",
+            (
+                os.getpid(),
+                evento,
+                json.dumps(turno),
+                json.dumps(anterior) if anterior is not None else None,
+            ),
+        )
+        self.conn.commit()
+
+    def ultimo_cambio_id(self) -> int:
+        cur = self.conn.cursor()
+        cur.execute("SELECT COALESCE(MAX(id), 0) FROM cambios")
+        return cur.fetchone()[0]
+
+    def cambios_desde(self, ultimo_id: int, limite: int = 500) -> List[Dict[str, Any]]:
+        """
+        Cambios con id > ultimo_id, en orden. Incluye pid para que cada proceso
+        saltee los propios.
+        """
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            SELECT id, pid, evento, turno, anterior FROM cambios
+            WHERE id > ?
+            ORDER BY id
+            LIMIT ?
+            """,
+            (ultimo_id, limite),
+        )
+        return [
+            {
+                "id": fila[0],
+                "pid": fila[1],
+                "evento": fila[2],
+                "turno": json.loads(fila[3]),
+                "anterior": json.loads(fila[4]) if fila[4] else None,
+            }
+            for fila in cur.fetchall()
+        ]
+
+    def purgar_cambios(self, horas: int = 1) -> int:
+        cur = self.conn.cursor()
+        cur.execute(
+            "DELETE FROM cambios WHERE creado_at < datetime('now', ?)",
+            (f"-{int(horas)} hours",),
+        )
+        self.conn.commit()
+        return cur.rowcount or 0
+
+    # ---------------------------
+    # Archivado (histórico)
+    # ---------------------------
+    def archivar_anteriores(self, fecha_corte: str, batch_size: int = 500) -> int:
+        """
+        Mueve a turnos_archivo hasta batch_size turnos con fecha < fecha_corte.
+        Cada lote es una sola transacción (INSERT + DELETE). Retorna cuántos movió;
+        0 significa que no queda nada por archivar.
+        """
+        cur = self.conn.cursor()
+        cur.execute(
+            "SELECT rowid FROM turnos WHERE fecha < ? LIMIT ?",
+            (fecha_corte, batch_size),
+        )
+        ids = [fila[0] for fila in cur.fetchall()]
+        if not ids:
+            return 0
+
+        marcas = ", ".join("?" for _ in ids)
+        try:
+            cur.execute(
+                f"""
+                INSERT INTO turnos_archivo
+                    (id_original, user_id, contacto_id, updated_at, fecha, hora,
+                     servicio, estado, archivado_at)
+                SELECT
+                    rowid, user_id, contacto_id, updated_at, fecha, hora,
+                    servicio, estado, datetime('now')
+                FROM turnos
+                WHERE rowid IN ({marcas})
+                """,
+                ids,
+            )
+            cur.execute(f"DELETE FROM turnos WHERE rowid IN ({marcas})", ids)
+            # Los recordatorios de turnos pasados ya no sirven
+            cur.execute(
+                f"DELETE FROM recordatorios_enviados WHERE turno_id IN ({marcas})", ids
+            )
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        return len(ids)
+
+    def contar_turnos(self) -> Dict[str, int]:
+        """
+        Tamaño de la tabla caliente y del histórico (para métricas).
+        """
+        cur = self.conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM turnos")
+        activos = cur.fetchone()[0]
+        cur.execute("SELECT COUNT(*) FROM turnos_archivo")
+        archivados = cur.fetchone()[0]
+        return {"turnos": activos, "turnos_archivo": archivados}
 
     # ---------------------------
     # Reset (desarrollo)
@@ -230,9 +834,18 @@ class SQLiteRepository(ITurnoRepository):
         """
         cur = self.conn.cursor()
         if drop:
+            # El DROP borra la fila de sqlite_sequence: se guarda para que los
+            # tickets (y las marcas de recordatorios por turno_id) no se repitan
+            cur.execute(
+                "SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'turnos'), 0),"
+                " COALESCE((SELECT MAX(rowid) FROM turnos), 0))"
+            )
+            secuencia = cur.fetchone()[0]
             cur.execute("DROP TABLE IF EXISTS turnos;")
             self.conn.commit()
             self._create_schema()
+            self._asegurar_secuencia(cur, minimo=secuencia)
+            self.conn.commit()
             return 0
 
         cur.execute("DELETE FROM turnos;")
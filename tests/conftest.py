@@ -0,0 +1,78 @@
+# tests/conftest.py
+# Fixtures comunes: base SQLite temporaria por test y un transporte de
+# Telegram falso que guarda los mensajes en vez de mandarlos.
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from domain.service import TurnoService
+from repo.sqlite_repo import SQLiteRepository, conectar
+
+TZ = ZoneInfo("America/Argentina/Buenos_Aires")
+
+
+class TransporteStub:
+    """Cumple api.bot.Transporte: guarda (chat_id, texto) de cada envío."""
+
+    def __init__(self):
+        self.enviados: list[tuple[int, str]] = []
+
+    async def enviar(self, chat_id: int, text: str) -> bool:
+        self.enviados.append((chat_id, text))
+        return True
+
+    def ultimo(self, chat_id: int) -> str:
+        return [t for c, t in self.enviados if c == chat_id][-1]
+
+
+class TransporteQueFalla(TransporteStub):
+    """Las primeras `fallas` llamadas a enviar fallan (retornan False)."""
+
+    def __init__(self, fallas: int):
+        super().__init__()
+        self.fallas = fallas
+
+    async def enviar(self, chat_id: int, text: str) -> bool:
+        if self.fallas:
+            self.fallas -= 1
+            return False
+        return await super().enviar(chat_id, text)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "turnos.db")
+
+
+@pytest.fixture
+def repo(db_path):
+    conn = conectar(db_path)
+    yield SQLiteRepository(conn)
+    conn.close()
+
+
+@pytest.fixture
+def service(repo):
+    return TurnoService(repo)
+
+
+@pytest.fixture
+def transporte():
+    return TransporteStub()
+
+
+@pytest.fixture
+def fecha():
+    # Siempre en el futuro: no la afecta el filtro de horas pasadas de hoy
+    return (datetime.now(TZ) + timedelta(days=7)).strftime("%Y-%m-%d")
+
+
+def reservar(service: TurnoService, fecha: str, hora: str, contacto: str, servicio: str = "corte") -> dict:
+    return service.reservar({
+        "nombre_cliente": f"tg_{contacto}",
+        "telefono_cliente": contacto,
+        "fecha_turno": fecha,
+        "hora_turno": hora,
+        "servicio": servicio,
+    })
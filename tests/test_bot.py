@@ -0,0 +1,141 @@
+# tests/test_bot.py
+# RouterComandos.despachar de punta a punta contra un transporte falso.
+import asyncio
+
+import pytest
+
+from api.bot import RouterComandos
+from tests.conftest import reservar
+
+CHAT = 555
+OTRO_CHAT = 777
+
+
+@pytest.fixture
+def router(service, transporte):
+    return RouterComandos(service, transporte)
+
+
+def despachar(router: RouterComandos, chat_id: int, texto: str) -> str:
+    asyncio.run(router.despachar(chat_id, texto))
+    return router.transporte.ultimo(chat_id)
+
+
+def test_comando_desconocido(router):
+    assert "No entendí el comando" in despachar(router, CHAT, "/hola")
+    assert "No entendí el comando" in despachar(router, CHAT, "texto suelto")
+
+
+def test_start_lista_comandos(router):
+    respuesta = despachar(router, CHAT, "/start")
+    for nombre in ("/reservar", "/mios", "/cancelar", "/reprogramar"):
+        assert nombre in respuesta
+
+
+def test_comando_con_mencion_al_bot(router):
+    assert "No tenés turnos" in despachar(router, CHAT, "/mios@TurnosBot")
+
+
+def test_reservar_y_mios(router, fecha):
+    respuesta = despachar(router, CHAT, f"/reservar {fecha} 10:00 corte")
+    assert "✅ Turno reservado" in respuesta
+    assert "Ticket: T-" in respuesta
+
+    mios = despachar(router, CHAT, "/mios")
+    assert f"{fecha} 10:00 - corte" in mios
+    # Los turnos de otro chat no aparecen
+    assert "No tenés turnos" in despachar(router, OTRO_CHAT, "/mios")
+
+
+def test_mios_sin_turnos(router):
+    assert despachar(router, CHAT, "/mios") == "No tenés turnos reservados."
+
+
+def test_cancelar_turno_propio(router, service, fecha):
+    ticket = reservar(service, fecha, "10:00", str(CHAT))["ticket"]
+
+    respuesta = despachar(router, CHAT, f"/cancelar {ticket}")
+    assert "🗑 Turno cancelado" in respuesta
+    assert service.get_por_ticket(ticket) is None
+
+
+def test_cancelar_turno_ajeno(router, service, fecha):
+    ticket = reservar(service, fecha, "10:00", str(OTRO_CHAT))["ticket"]
+
+    respuesta = despachar(router, CHAT, f"/cancelar {ticket}")
+    assert respuesta == "❌ No encontré ese ticket entre tus turnos."
+    # Sigue reservado para su dueño
+    assert service.get_por_ticket(ticket) is not None
+
+
+def test_cancelar_ticket_inexistente(router):
+    assert "No encontré ese ticket" in despachar(router, CHAT, "/cancelar T-999999")
+
+
+def test_reprogramar(router, service, fecha):
+    ticket = reservar(service, fecha, "10:00", str(CHAT))["ticket"]
+
+    respuesta = despachar(router, CHAT, f"/reprogramar {ticket} {fecha} 11:30")
+    assert "🔁 Turno reprogramado" in respuesta
+    assert service.get_por_ticket(ticket)["hora"] == "11:30"
+
+
+def test_reprogramar_a_slot_ocupado(router, service, fecha):
+    ticket = reservar(service, fecha, "10:00", str(CHAT))["ticket"]
+    reservar(service, fecha, "11:00", str(OTRO_CHAT))
+
+    respuesta = despachar(router, CHAT, f"/reprogramar {ticket} {fecha} 11:00")
+    assert respuesta == "❌ Ese horario ya está ocupado."
+    assert service.get_por_ticket(ticket)["hora"] == "10:00"
+
+
+def test_reprogramar_turno_ajeno(router, service, fecha):
+    ticket = reservar(service, fecha, "10:00", str(OTRO_CHAT))["ticket"]
+
+    respuesta = despachar(router, CHAT, f"/reprogramar {ticket} {fecha} 12:00")
+    assert "No encontré ese ticket" in respuesta
+    assert service.get_por_ticket(ticket)["hora"] == "10:00"
+
+
+@pytest.mark.parametrize("texto, error", [
+    ("/reservar", "faltan_argumentos"),
+    ("/reservar 2030-01-10 10:00", "faltan_argumentos"),
+    ("/reservar 10-01-2030 10:00 corte", "fecha_invalida"),
+    ("/reservar 2030-01-10 diez corte", "hora_invalida"),
+    ("/cancelar", "faltan_argumentos"),
+    ("/cancelar T-000001 extra", "sobran_argumentos"),
+    ("/reprogramar T-000001 2030-01-10 10:00 11:00", "sobran_argumentos"),
+    ("/cancelar abc", "ticket_invalido"),
+    ("/reprogramar T-000001 2030-01-10", "faltan_argumentos"),
+    ("/disponibilidad", "faltan_argumentos"),
+])
+def test_argumentos_invalidos(router, texto, error):
+    respuesta = despachar(router, CHAT, texto)
+    assert respuesta.startswith(f"⚠️ {error}")
+    assert "Formato correcto" in respuesta
+
+
+def test_error_de_negocio(router, fecha):
+    respuesta = despachar(router, CHAT, f"/reservar {fecha} 10:15 corte")
+    assert respuesta == "⚠️ Error: hora_no_cae_en_slot"
+
+
+def test_reservar_slot_ocupado(router, service, fecha):
+    reservar(service, fecha, "10:00", str(OTRO_CHAT))
+    assert despachar(router, CHAT, f"/reservar {fecha} 10:00 corte") == "❌ Ese turno ya está ocupado."
+
+
+def test_metricas_por_comando(router, fecha):
+    despachar(router, CHAT, "/mios")
+    despachar(router, CHAT, "/cancelar abc")
+
+    metricas = router.metricas()
+    assert metricas["/mios"]["llamadas"] == 1
+    assert metricas["/mios"]["errores"] == 0
+    assert metricas["/cancelar"]["llamadas"] == 1
+    assert metricas["/cancelar"]["errores"] == 1
+
+
+def test_disponibilidad_con_servicio_de_varias_palabras(router, fecha):
+    respuesta = despachar(router, CHAT, f"/disponibilidad {fecha} corte de pelo")
+    assert respuesta.startswith(f"📅 Turnos disponibles el {fecha}")
@@ -0,0 +1,222 @@
+# tests/test_espera.py
+# Lista de espera: oferta del slot liberado, retención y bajas.
+import asyncio
+import time
+from datetime import datetime
+
+import pytest
+
+import domain.espera
+from api.bot import RouterComandos
+from api.respuestas import CacheDisponibilidad
+from domain.espera import TZ, ListaEspera
+from tests.conftest import TransporteQueFalla, reservar
+
+
+@pytest.fixture
+def espera(repo, service, transporte):
+    lista = ListaEspera(repo, service, transporte.enviar, retencion_seg=600)
+    service.retenciones = lista
+    service.suscribir(lista.on_cambio)
+    return lista
+
+
+@pytest.fixture
+def router(service, transporte, espera):
+    return RouterComandos(service, transporte, espera=espera)
+
+
+def correr(espera: ListaEspera, escenario):
+    """
+    Corre el escenario con el loop de la lista iniciado (como en el líder)
+    y espera a que terminen las ofertas que quedaron en segundo plano.
+    """
+    async def principal():
+        espera.iniciar()
+        try:
+            return await escenario()
+        finally:
+            await asyncio.gather(*espera._ofertas_en_curso)
+            await espera.detener()
+
+    return asyncio.run(principal())
+
+
+async def ofertas_pendientes(espera: ListaEspera) -> None:
+    await asyncio.gather(*espera._ofertas_en_curso)
+
+
+def test_alta_por_api_con_chat_toma_el_slot_desde_el_bot(service, espera, router, transporte, fecha):
+    # Anotado por la API con teléfono; el aviso le llega al chat 555
+    espera.registrar("222", 555, fecha, "10:00", "10:00")
+    ticket = reservar(service, fecha, "10:00", "111")["ticket"]
+
+    async def escenario():
+        service.delete_por_ticket(ticket)
+        await ofertas_pendientes(espera)
+        assert "Se liberó un turno" in transporte.ultimo(555)
+
+        # Retenido: otro chat no lo puede tomar
+        await router.despachar(777, f"/reservar {fecha} 10:00 corte")
+        assert transporte.ultimo(777) == "❌ Ese turno ya está ocupado."
+
+        await router.despachar(555, f"/reservar {fecha} 10:00 corte")
+        assert "✅ Turno reservado" in transporte.ultimo(555)
+
+    correr(espera, escenario)
+    assert espera.metricas["cumplidos"] == 1
+    assert espera.retenido_para(fecha, "10:00") is None
+
+
+def test_alta_por_api_toma_el_slot_con_el_telefono(service, espera, fecha):
+    espera.registrar("222", 555, fecha, "10:00", "10:00")
+    ticket = reservar(service, fecha, "10:00", "111")["ticket"]
+
+    async def escenario():
+        service.delete_por_ticket(ticket)
+        await ofertas_pendientes(espera)
+        reservar(service, fecha, "10:00", "222")
+
+    correr(espera, escenario)
+    assert espera.metricas["cumplidos"] == 1
+
+
+def test_baja_de_una_espera_ofrecida_pasa_al_siguiente(service, espera, transporte, fecha):
+    primera = espera.registrar("a", 1, fecha, "09:00", "12:00")
+    espera.registrar("b", 2, fecha, "10:00", "10:00")
+    ticket = reservar(service, fecha, "10:00", "111")["ticket"]
+
+    async def escenario():
+        service.delete_por_ticket(ticket)
+        await ofertas_pendientes(espera)
+        assert espera.retenido_para(fecha, "10:00") == ("a", "1")
+
+        assert espera.baja(primera, "a")
+        await ofertas_pendientes(espera)
+        assert espera.retenido_para(fecha, "10:00") == ("b", "2")
+        assert "Se liberó un turno" in transporte.ultimo(2)
+
+    correr(espera, escenario)
+    assert espera.metricas["ofrecidos"] == 2
+
+
+def test_noesperar_desde_el_chat_de_un_alta_por_api(espera, router, transporte, fecha):
+    espera_id = espera.registrar("222", 555, fecha, "10:00", "11:00")
+
+    asyncio.run(router.despachar(555, f"/noesperar {espera_id}"))
+    assert "saliste de la lista de espera" in transporte.ultimo(555)
+    asyncio.run(router.despachar(777, f"/noesperar {espera_id}"))
+    assert "No encontré esa espera" in transporte.ultimo(777)
+
+
+def test_no_ofrece_un_slot_de_hoy_que_ya_paso(espera, monkeypatch):
+    class Ahora(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2030, 1, 10, 14, 0, tzinfo=TZ)
+
+    monkeypatch.setattr(domain.espera, "datetime", Ahora)
+    espera.registrar("a", 1, "2030-01-10", "09:00", "18:00")
+
+    assert asyncio.run(espera.ofrecer("2030-01-10", "10:00")) is None
+    assert espera.retenido_para("2030-01-10", "10:00") is None
+    assert asyncio.run(espera.ofrecer("2030-01-10", "15:00")) is not None
+
+
+def test_alta_sin_chat(espera, fecha):
+    with pytest.raises(ValueError, match="chat_requerido"):
+        espera.registrar("222", None, fecha, "10:00", "11:00")
+
+
+def test_espera_vieja_sin_chat_no_recibe_la_oferta(repo, espera, fecha):
+    # Alta anterior a exigir chat_id: sigue activa en la base, pero no se le ofrece
+    sin_chat = repo.agregar_espera("a", None, fecha, "10:00", "10:00")
+    con_chat = espera.registrar("b", 2, fecha, "10:00", "10:00")
+
+    assert asyncio.run(espera.ofrecer(fecha, "10:00")) == con_chat
+    assert espera.retenido_para(fecha, "10:00") == ("b", "2")
+    assert repo.baja_espera(sin_chat, "a")["estado"] == "activo"
+
+
+def test_aviso_fallido_libera_el_slot_y_pasa_al_siguiente(repo, service, fecha):
+    transporte = TransporteQueFalla(fallas=1)
+    espera = ListaEspera(repo, service, transporte.enviar, retencion_seg=600)
+    service.retenciones = espera
+    primera = espera.registrar("a", 1, fecha, "10:00", "10:00")
+    segunda = espera.registrar("b", 2, fecha, "10:00", "10:00")
+
+    assert asyncio.run(espera.ofrecer(fecha, "10:00")) == segunda
+    assert espera.retenido_para(fecha, "10:00") == ("b", "2")
+    assert "Se liberó un turno" in transporte.ultimo(2)
+    assert espera.metricas["avisos_fallidos"] == 1
+    assert espera.metricas["ofrecidos"] == 1
+    # La primera quedó vencida: ya no se puede dar de baja
+    assert not espera.baja(primera, "a")
+
+
+def test_aviso_fallido_sin_siguiente_deja_el_slot_libre(repo, service, fecha):
+    espera = ListaEspera(repo, service, TransporteQueFalla(fallas=1).enviar)
+    service.retenciones = espera
+    espera.registrar("a", 1, fecha, "10:00", "10:00")
+
+    assert asyncio.run(espera.ofrecer(fecha, "10:00")) is None
+    assert espera.retenido_para(fecha, "10:00") is None
+    reservar(service, fecha, "10:00", "111")
+
+
+def test_slot_retenido_por_otro_proceso_no_saca_a_la_espera_del_indice(repo, espera, fecha, monkeypatch):
+    primera = espera.registrar("a", 1, fecha, "10:00", "11:00")
+    # Otro worker ofreció el slot entre el chequeo de retención y el UPDATE
+    otra = repo.agregar_espera("b", 2, fecha, "10:00", "10:00")
+    assert repo.ofrecer_espera(otra, fecha, "10:00", time.time() + 600)
+    chequeo = repo.retencion_vigente
+    monkeypatch.setattr(repo, "retencion_vigente", lambda *a: None)
+
+    assert asyncio.run(espera.ofrecer(fecha, "10:00")) is None
+    assert primera in espera._activos
+
+    # Cuando esa oferta se cae, el slot le llega a la que esperaba
+    monkeypatch.setattr(repo, "retencion_vigente", chequeo)
+    repo.descartar_oferta(otra)
+    assert asyncio.run(espera.ofrecer(fecha, "10:00")) == primera
+
+
+def test_slot_retenido_no_figura_libre_y_la_cache_se_entera(repo, service, espera, fecha):
+    cache = CacheDisponibilidad()
+    service.suscribir(cache.on_cambio)
+    espera.registrar("a", 1, fecha, "10:00", "10:00")
+    assert b'"10:00"' in cache.obtener(service, fecha)
+
+    asyncio.run(espera.ofrecer(fecha, "10:00"))
+    assert "10:00" not in service.get_disponibilidad(fecha)["libres"]
+    assert b'"10:00"' not in cache.obtener(service, fecha)
+
+    # Vence la oferta y no hay nadie más esperando: vuelve a estar libre
+    repo.conn.execute("UPDATE espera SET vence_ts = 0")
+    asyncio.run(espera.revisar_vencidas())
+    assert b'"10:00"' in cache.obtener(service, fecha)
+
+
+def test_baja_de_una_oferta_libera_el_slot_en_la_cache(service, espera, fecha):
+    cache = CacheDisponibilidad()
+    service.suscribir(cache.on_cambio)
+    espera_id = espera.registrar("a", 1, fecha, "10:00", "10:00")
+    asyncio.run(espera.ofrecer(fecha, "10:00"))
+    assert b'"10:00"' not in cache.obtener(service, fecha)
+
+    espera.baja(espera_id, "a")
+    assert b'"10:00"' in cache.obtener(service, fecha)
+
+
+def test_tope_de_esperas_por_contacto(repo, service, transporte, fecha):
+    espera = ListaEspera(repo, service, transporte.enviar, max_por_contacto=2)
+    primera = espera.registrar("222", 555, fecha, "10:00", "11:00")
+    espera.registrar("222", 555, fecha, "12:00", "13:00")
+    with pytest.raises(ValueError, match="demasiadas_esperas"):
+        espera.registrar("222", 555, fecha, "14:00", "15:00")
+    # Cambiar de teléfono con el mismo chat no lo saltea
+    with pytest.raises(ValueError, match="demasiadas_esperas"):
+        espera.registrar("333", 555, fecha, "14:00", "15:00")
+
+    assert espera.baja(primera, "222")
+    espera.registrar("222", 555, fecha, "14:00", "15:00")
@@ -0,0 +1,100 @@
+# tests/test_rate_limit.py
+import pytest
+
+from api.rate_limit import RateLimiter, TokenBucketLimiter, parse_limite
+
+
+class Reloj:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self) -> float:
+        return self.t
+
+
+def test_parse_limite():
+    assert parse_limite("10/60") == (10.0, 10 / 60)
+    with pytest.raises(ValueError):
+        parse_limite("10")
+    with pytest.raises(ValueError):
+        parse_limite("0/60")
+
+
+def test_bucket_recarga():
+    reloj = Reloj()
+    limiter = TokenBucketLimiter(2, 1, reloj=reloj)
+    assert limiter.permitir("a")
+    assert limiter.permitir("a")
+    assert not limiter.permitir("a")
+    assert limiter.reintentar_en("a") == pytest.approx(1.0)
+
+    reloj.t += 1
+    assert limiter.permitir("a")
+
+
+def test_rechazo_por_ip_no_gasta_el_telefono():
+    reloj = Reloj()
+    limiter = RateLimiter({"reservar": "2/60"}, reloj=reloj)
+    assert limiter.permitir("reservar", "ip:1", "tel:a") == 0
+    assert limiter.permitir("reservar", "ip:1", "tel:b") == 0
+
+    # La IP está agotada: los teléfonos nuevos no pagan el rechazo
+    for _ in range(5):
+        assert limiter.permitir("reservar", "ip:1", "tel:c") > 0
+    assert limiter.permitir("reservar", "ip:2", "tel:c") == 0
+    assert limiter.permitir("reservar", "ip:2", "tel:c") == 0
+
+
+def test_rechazo_por_telefono_no_gasta_la_ip():
+    reloj = Reloj()
+    limiter = RateLimiter({"reservar": "2/60"}, reloj=reloj)
+    limiter.permitir("reservar", "ip:1", "tel:a")
+    limiter.permitir("reservar", "ip:2", "tel:a")
+
+    for _ in range(5):
+        assert limiter.permitir("reservar", "ip:3", "tel:a") > 0
+    assert limiter.permitir("reservar", "ip:3", "tel:b") == 0
+    assert limiter.permitir("reservar", "ip:3", "tel:c") == 0
+
+
+def test_espera_es_la_mayor_de_las_claves():
+    reloj = Reloj()
+    limiter = RateLimiter({"reservar": "1/60"}, reloj=reloj)
+    limiter.permitir("reservar", "ip:1")
+    reloj.t += 30
+    limiter.permitir("reservar", "tel:a")
+
+    # ip:1 recarga en 30 s, tel:a en 60 s
+    assert limiter.permitir("reservar", "ip:1", "tel:a") == pytest.approx(60.0)
+
+
+def test_ruta_sin_limite():
+    limiter = RateLimiter({"reservar": "1/60", "webhook": ""})
+    for _ in range(10):
+        assert limiter.permitir("webhook", "chat:1") == 0
+
+
+def test_limites_separados_por_ip_y_telefono():
+    reloj = Reloj()
+    limiter = RateLimiter({"reservar": "2/60", "reservar_ip": "10/60"}, reloj=reloj)
+
+    # Misma IP (p.ej. un proxy), teléfonos distintos: no se corta en 2
+    for i in range(6):
+        assert limiter.permitir_varias(("reservar_ip", "ip:1"), ("reservar", f"tel:{i}")) == 0
+
+    # Un teléfono agotado no gasta la IP
+    limiter.permitir_varias(("reservar_ip", "ip:2"), ("reservar", "tel:x"))
+    limiter.permitir_varias(("reservar_ip", "ip:2"), ("reservar", "tel:x"))
+    for _ in range(5):
+        assert limiter.permitir_varias(("reservar_ip", "ip:1"), ("reservar", "tel:x")) > 0
+    for i in range(4):
+        assert limiter.permitir_varias(("reservar_ip", "ip:1"), ("reservar", f"tel:n{i}")) == 0
+    # Ahora sí: la IP llegó a 10
+    espera = limiter.permitir_varias(("reservar_ip", "ip:1"), ("reservar", "tel:z"))
+    assert espera == pytest.approx(6.0)
+
+
+def test_permitir_varias_ignora_rutas_sin_limite():
+    limiter = RateLimiter({"reservar": "1/60", "reservar_ip": ""})
+    assert limiter.permitir_varias(("reservar_ip", "ip:1"), ("reservar", "tel:a")) == 0
+    assert limiter.permitir_varias(("reservar_ip", "ip:1"), ("reservar", "tel:a")) > 0
@@ -0,0 +1,164 @@
+# tests/test_recordatorios.py
+# ProgramadorRecordatorios con reloj inyectado: se avanza el reloj y se
+# despachan los vencidos a mano (procesar_vencidos), sin el loop de fondo.
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from domain.recordatorios import TZ, ProgramadorRecordatorios, texto_falta
+from tests.conftest import TransporteQueFalla, reservar
+
+CHAT = 555
+FECHA = "2030-01-10"
+
+
+class Reloj:
+    def __init__(self, dt: datetime):
+        self.t = dt.timestamp()
+
+    def __call__(self) -> float:
+        return self.t
+
+    def ir_a(self, dia: int, hora: int, minuto: int = 0) -> None:
+        self.t = datetime(2030, 1, dia, hora, minuto, tzinfo=TZ).timestamp()
+
+
+@pytest.fixture
+def reloj():
+    return Reloj(datetime(2030, 1, 9, 8, 0, tzinfo=TZ))
+
+
+def programador(repo, service, transporte, reloj) -> ProgramadorRecordatorios:
+    prog = ProgramadorRecordatorios(repo, transporte.enviar, reloj=reloj)
+    service.suscribir(prog.on_cambio)
+    prog.cargar()
+    return prog
+
+
+@pytest.fixture
+def prog(repo, service, transporte, reloj):
+    return programador(repo, service, transporte, reloj)
+
+
+def procesar(prog: ProgramadorRecordatorios) -> int:
+    return asyncio.run(prog.procesar_vencidos())
+
+
+def test_texto_falta():
+    assert texto_falta(7200) == "2 horas"
+    assert texto_falta(3600) == "1 hora"
+    assert texto_falta(5400) == "1 h 30 min"
+    assert texto_falta(600) == "10 min"
+    assert texto_falta(5) == "1 min"
+
+
+def test_dia_y_dos_horas_antes(prog, service, transporte, reloj):
+    reservar(service, FECHA, "10:00", str(CHAT))
+
+    reloj.ir_a(9, 9, 59)
+    assert procesar(prog) == 0
+
+    reloj.ir_a(9, 10, 0)
+    procesar(prog)
+    assert transporte.ultimo(CHAT).startswith(f"⏰ Recordatorio: tenés turno el {FECHA} a las 10:00.")
+
+    reloj.ir_a(10, 8, 0)
+    procesar(prog)
+    assert transporte.ultimo(CHAT).startswith("⏰ En 2 horas tenés turno (10:00).")
+    assert len(transporte.enviados) == 2
+    assert prog.pendientes() == 0
+
+
+def test_turno_sacado_dentro_de_la_ventana_no_dispara_el_atrasado(prog, service, transporte, reloj):
+    # Reservado hoy a las 15 para mañana a las 10: sin "dia", sí el de 2 h
+    reloj.ir_a(9, 15, 0)
+    reservar(service, FECHA, "10:00", str(CHAT))
+    assert procesar(prog) == 0
+
+    reloj.ir_a(10, 8, 0)
+    procesar(prog)
+    assert len(transporte.enviados) == 1
+    assert "En 2 horas" in transporte.ultimo(CHAT)
+
+
+def test_turno_a_menos_de_dos_horas_no_recibe_recordatorios(prog, service, transporte, reloj):
+    reloj.ir_a(10, 9, 0)
+    reservar(service, FECHA, "09:30", str(CHAT))
+    assert procesar(prog) == 0
+    assert prog.pendientes() == 0
+    assert transporte.enviados == []
+
+
+def test_al_cargar_manda_uno_solo_por_ventana_con_el_tiempo_real(repo, service, transporte, reloj):
+    reservar(service, FECHA, "10:00", str(CHAT))
+
+    # Proceso caído hasta las 8:30 del día del turno: el "dia" ya no vale
+    reloj.ir_a(10, 8, 30)
+    prog = programador(repo, service, transporte, reloj)
+    procesar(prog)
+    assert len(transporte.enviados) == 1
+    assert transporte.ultimo(CHAT).startswith("⏰ En 1 h 30 min tenés turno (10:00).")
+
+
+def test_reprogramar_descarta_el_viejo(prog, service, transporte, reloj):
+    ticket = reservar(service, FECHA, "10:00", str(CHAT))["ticket"]
+    service.patch_por_ticket(ticket, {"hora": "11:00"})
+
+    reloj.ir_a(9, 10, 0)
+    procesar(prog)
+    assert transporte.enviados == []
+    assert prog.metricas["descartados"] == 1
+
+    reloj.ir_a(9, 11, 0)
+    procesar(prog)
+    assert "a las 11:00" in transporte.ultimo(CHAT)
+
+
+def test_cancelar_descarta(prog, service, transporte, reloj):
+    ticket = reservar(service, FECHA, "10:00", str(CHAT))["ticket"]
+    service.delete_por_ticket(ticket)
+
+    reloj.ir_a(10, 8, 0)
+    procesar(prog)
+    assert transporte.enviados == []
+
+
+def test_reinicio_no_duplica(repo, service, transporte, reloj, prog):
+    reservar(service, FECHA, "10:00", str(CHAT))
+    reloj.ir_a(9, 10, 0)
+    procesar(prog)
+    assert len(transporte.enviados) == 1
+
+    # Otro proceso (o un reinicio) arma el heap de nuevo a la misma hora
+    nuevo = programador(repo, service, transporte, reloj)
+    procesar(nuevo)
+    assert len(transporte.enviados) == 1
+
+
+def test_reintenta_si_falla_el_envio(repo, service, reloj):
+    transporte = TransporteQueFalla(fallas=1)
+    prog = programador(repo, service, transporte, reloj)
+    reservar(service, FECHA, "10:00", str(CHAT))
+
+    reloj.ir_a(9, 10, 0)
+    procesar(prog)
+    assert prog.metricas["fallidos"] == 1
+    assert transporte.enviados == []
+
+    reloj.ir_a(9, 10, 1)
+    procesar(prog)
+    assert len(transporte.enviados) == 1
+    assert prog.metricas["enviados"] == 1
+
+
+def test_turnos_sin_chat_no_se_programan(prog, service):
+    reservar(service, FECHA, "10:00", "11-5555-0000")
+    assert prog.pendientes() == 0
+
+
+def test_reset_vacia_el_heap(prog, service):
+    reservar(service, FECHA, "10:00", str(CHAT))
+    assert prog.pendientes() == 2
+    service.reset()
+    assert prog.pendientes() == 0
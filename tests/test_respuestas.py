@@ -0,0 +1,76 @@
+# tests/test_respuestas.py
+import json
+from datetime import datetime
+
+from api.respuestas import TZ, CacheDisponibilidad, RespuestaJSON
+from domain.models import disponibilidadResponde
+
+
+class Reloj:
+    def __init__(self, dt: datetime):
+        self.t = dt.timestamp()
+
+    def __call__(self) -> float:
+        return self.t
+
+    def ir_a(self, dt: datetime) -> None:
+        self.t = dt.timestamp()
+
+
+class ServiceFalso:
+    def __init__(self):
+        self.libres = ["09:00", "09:30", "10:00"]
+        self.llamadas = 0
+
+    def get_disponibilidad(self, fecha: str, servicio: str | None = None) -> dict:
+        self.llamadas += 1
+        return {"fecha": fecha, "libres": list(self.libres)}
+
+
+def test_respuesta_json_renderiza_modelo_y_bytes():
+    modelo = disponibilidadResponde(fecha="2030-01-10", libres=["09:00"])
+    assert json.loads(RespuestaJSON(modelo).body) == {"fecha": "2030-01-10", "libres": ["09:00"]}
+    assert RespuestaJSON(b'{"a":1}').body == b'{"a":1}'
+
+
+def test_cache_fecha_futura_e_invalidacion():
+    reloj = Reloj(datetime(2030, 1, 9, 10, 0, tzinfo=TZ))
+    cache = CacheDisponibilidad(reloj=reloj)
+    service = ServiceFalso()
+
+    primero = cache.obtener(service, "2030-01-10")
+    assert cache.obtener(service, "2030-01-10") is primero
+    assert service.llamadas == 1
+
+    cache.on_cambio("reservado", {"fecha": "2030-01-10"}, None)
+    cache.obtener(service, "2030-01-10")
+    assert service.llamadas == 2
+
+
+def test_cache_no_guarda_hoy_ni_formas_no_canonicas():
+    reloj = Reloj(datetime(2030, 1, 10, 10, 0, tzinfo=TZ))
+    cache = CacheDisponibilidad(reloj=reloj)
+    service = ServiceFalso()
+
+    cache.obtener(service, "2030-01-10")
+    cache.obtener(service, "2030-01-10")
+    cache.obtener(service, "2030-1-11")
+    cache.obtener(service, "2030-1-11")
+    assert service.llamadas == 4
+
+
+def test_cache_descarta_la_fecha_que_paso_a_ser_hoy():
+    reloj = Reloj(datetime(2030, 1, 9, 23, 0, tzinfo=TZ))
+    cache = CacheDisponibilidad(reloj=reloj)
+    service = ServiceFalso()
+    cache.obtener(service, "2030-01-10")
+
+    # Al otro día a las 14:00 el service ya filtra los slots pasados
+    reloj.ir_a(datetime(2030, 1, 10, 14, 0, tzinfo=TZ))
+    service.libres = ["14:00", "14:30"]
+    data = json.loads(cache.obtener(service, "2030-01-10"))
+    assert data["libres"] == ["14:00", "14:30"]
+    assert service.llamadas == 2
+    # Y no se vuelve a cachear: hoy cambia con la hora
+    cache.obtener(service, "2030-01-10")
+    assert service.llamadas == 3
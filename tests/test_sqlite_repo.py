@@ -0,0 +1,85 @@
+# tests/test_sqlite_repo.py
+# Escrituras que compiten desde dos conexiones a la misma base (como dos
+# workers de uvicorn): el chequeo de slot libre va dentro de la escritura.
+import pytest
+
+from api.respuestas import CacheDisponibilidad
+from api.sincronizacion import CanalCambios
+from domain.interfaces import SlotOcupadoError
+from domain.service import TurnoService
+from repo.sqlite_repo import SQLiteRepository, conectar
+from tests.conftest import reservar
+
+
+@pytest.fixture
+def otro_repo(db_path, repo):
+    conn = conectar(db_path)
+    yield SQLiteRepository(conn)
+    conn.close()
+
+
+def test_insert_compite_por_el_slot(repo, otro_repo, fecha):
+    turno = {
+        "nombre_cliente": "a", "telefono_cliente": "111", "fecha_turno": fecha,
+        "hora_turno": "10:00", "servicio": "corte", "estado": "reservado",
+    }
+    repo.save_turno(turno)
+    with pytest.raises(SlotOcupadoError):
+        otro_repo.save_turno({**turno, "telefono_cliente": "222"})
+
+
+def test_update_compite_por_el_slot(repo, otro_repo, service, fecha):
+    x = reservar(service, fecha, "10:00", "111")["id"]
+    y = reservar(service, fecha, "11:00", "222")["id"]
+
+    # Los dos "workers" ya vieron 12:00 libre; sólo uno puede quedárselo
+    assert repo.update_turno_by_rowid(x, {"fecha": fecha, "hora": "12:00"})["hora"] == "12:00"
+    with pytest.raises(SlotOcupadoError):
+        otro_repo.update_turno_by_rowid(y, {"fecha": fecha, "hora": "12:00"})
+    assert otro_repo.get_turno_by_rowid(y)["hora"] == "11:00"
+
+
+def test_update_solo_hora_usa_la_fecha_actual(repo, service, fecha):
+    x = reservar(service, fecha, "10:00", "111")["id"]
+    reservar(service, fecha, "11:00", "222")
+
+    with pytest.raises(SlotOcupadoError):
+        repo.update_turno_by_rowid(x, {"hora": "11:00"})
+    # Quedarse en su propio slot no es conflicto
+    assert repo.update_turno_by_rowid(x, {"hora": "10:00", "servicio": "color"})["servicio"] == "color"
+
+
+def test_update_inexistente(repo):
+    assert repo.update_turno_by_rowid(999, {"hora": "10:00"}) is None
+
+
+def test_patch_con_chequeo_viejo_responde_conflicto(repo, otro_repo, service, fecha, monkeypatch):
+    x = reservar(service, fecha, "10:00", "111")["ticket"]
+    y = reservar(service, fecha, "11:00", "222")["ticket"]
+    otro_service = TurnoService(otro_repo)
+
+    service.patch_por_ticket(x, {"hora": "12:00"})
+    # El otro worker chequeó antes de que se ocupara
+    monkeypatch.setattr(otro_repo, "existe_turno_en", lambda *a, **k: False)
+    with pytest.raises(RuntimeError, match="conflicto"):
+        otro_service.patch_por_ticket(y, {"hora": "12:00"})
+    assert otro_service.get_por_ticket(y)["hora"] == "11:00"
+
+
+def test_reset_limpia_la_cache_de_los_otros_workers(repo, otro_repo, service, fecha):
+    otro_service = TurnoService(otro_repo)
+    canal = CanalCambios(repo, service)
+    otro_canal = CanalCambios(otro_repo, otro_service)
+    otro_canal.pid = canal.pid + 1  # en los tests los dos "workers" comparten proceso
+    otro_canal._ultimo_id = otro_repo.ultimo_cambio_id()
+    otro_canal._data_version = otro_repo.data_version()
+
+    cache = CacheDisponibilidad()
+    otro_service.suscribir(cache.on_cambio)
+    reservar(service, fecha, "10:00", "111")
+    otro_canal.sondear()
+    assert b'"10:00"' not in cache.obtener(otro_service, fecha)
+
+    service.reset()
+    assert otro_canal.sondear() == 1
+    assert b'"10:00"' in cache.obtener(otro_service, fecha)
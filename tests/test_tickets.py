@@ -0,0 +1,75 @@
+# tests/test_tickets.py
+# Los tickets salen del id AUTOINCREMENT de 'turnos': nunca se reasignan.
+import sqlite3
+
+from repo.sqlite_repo import SQLiteRepository, conectar
+from domain.service import TurnoService
+from tests.conftest import reservar
+
+
+def test_ticket_cancelado_no_se_reasigna(service, fecha):
+    ticket = reservar(service, fecha, "10:00", "111")["ticket"]
+    assert service.delete_por_ticket(ticket)
+
+    nuevo = reservar(service, fecha, "10:00", "222")["ticket"]
+    assert nuevo != ticket
+    assert service.get_por_ticket(ticket) is None
+
+
+def test_ticket_archivado_no_se_reasigna(repo, service, fecha):
+    ticket = reservar(service, fecha, "10:00", "111")["ticket"]
+    repo.archivar_anteriores("9999-12-31")
+
+    nuevo = reservar(service, fecha, "11:00", "222")["ticket"]
+    assert nuevo != ticket
+    historial = service.listar_por_contacto("111", historial=True)
+    assert historial[0]["id"] == TurnoService.decode_ticket(ticket)
+
+
+def test_reset_drop_no_baja_de_los_archivados(repo, service, fecha):
+    ticket = reservar(service, fecha, "10:00", "111")["ticket"]
+    repo.archivar_anteriores("9999-12-31")
+    repo.reset(drop=True)
+
+    nuevo = reservar(service, fecha, "10:00", "222")["ticket"]
+    assert TurnoService.decode_ticket(nuevo) > TurnoService.decode_ticket(ticket)
+
+
+def test_migra_base_sin_autoincrement(db_path, fecha):
+    # Esquema previo: sin columna id, el ticket era el rowid implícito
+    viejo = sqlite3.connect(db_path)
+    viejo.execute(
+        """
+        CREATE TABLE turnos(
+            user_id TEXT, contacto_id TEXT, updated_at TEXT, fecha TEXT,
+            hora TEXT, servicio TEXT, estado TEXT,
+            UNIQUE(contacto_id, fecha, hora)
+        )
+        """
+    )
+    for hora, contacto in (("10:00", "111"), ("11:00", "222"), ("12:00", "333")):
+        viejo.execute(
+            "INSERT INTO turnos VALUES ('u', ?, NULL, ?, ?, 'corte', 'reservado')",
+            (contacto, fecha, hora),
+        )
+    viejo.execute("DELETE FROM turnos WHERE contacto_id = '222'")
+    viejo.commit()
+    viejo.close()
+
+    conn = conectar(db_path)
+    service = TurnoService(SQLiteRepository(conn))
+    # Los tickets ya entregados siguen apuntando al mismo turno
+    assert service.get_por_ticket("T-000003")["contacto_id"] == "333"
+    assert service.get_por_ticket("T-000002") is None
+
+    nuevo = reservar(service, fecha, "13:00", "444")["ticket"]
+    assert nuevo == "T-000004"
+    conn.close()
+
+
+def test_reset_drop_no_reusa_tickets(repo, service, fecha):
+    ticket = reservar(service, fecha, "10:00", "111")["ticket"]
+    repo.reset(drop=True)
+
+    nuevo = reservar(service, fecha, "10:00", "222")["ticket"]
+    assert TurnoService.decode_ticket(nuevo) > TurnoService.decode_ticket(ticket)